@@ -0,0 +1,204 @@
+import time
+import threading
+from datetime import datetime
+from yt_dlp.utils import parse_bytes
+
+
+def parse_rate(value):
+    """Parse a rate like "500K", "2M" or "0" (unlimited) into bytes per second"""
+    if value in (None, ''):
+        return 0
+    if isinstance(value, (int, float)):
+        return max(0, int(value))
+    rate = parse_bytes(str(value).strip())
+    if rate is None:
+        raise ValueError(f"Invalid bandwidth rate: {value}")
+    return rate
+
+
+def parse_schedule(text):
+    """Parse "08:00-18:00=2M; 22:00-06:00=0" into (start_minute, end_minute, rate) tuples"""
+    schedule = []
+    for item in (text or '').replace(',', ';').split(';'):
+        item = item.strip()
+        if not item:
+            continue
+        span, rate = item.split('=', 1)
+        start, end = span.split('-', 1)
+        schedule.append((_parse_minute(start), _parse_minute(end), parse_rate(rate)))
+    return schedule
+
+
+def _parse_minute(text):
+    """Parse HH:MM into minutes after midnight"""
+    hours, minutes = text.strip().split(':', 1)
+    return int(hours) * 60 + int(minutes)
+
+
+class TokenBucket:
+    """Thread-safe token bucket; callers go into debt and sleep it off"""
+
+    def __init__(self, rate=0, burst_seconds=1.0):
+        self.rate = rate
+        self.burst_seconds = burst_seconds
+        self.tokens = rate * burst_seconds
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate):
+        """Change the refill rate (0 disables limiting)"""
+        with self._lock:
+            self._refill()
+            self.rate = rate
+            self.tokens = min(self.tokens, rate * self.burst_seconds)
+
+    def _refill(self):
+        now = time.monotonic()
+        if self.rate:
+            self.tokens = min(self.rate * self.burst_seconds, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def consume(self, amount):
+        """Take tokens and return how long the caller should wait"""
+        with self._lock:
+            if not self.rate:
+                return 0
+            self._refill()
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0
+
+
+class BandwidthManager:
+    """Process-wide bandwidth cap with weighted per-job shares
+
+    Every job gets yt-dlp's `ratelimit` set to its weighted share of the cap,
+    updated live whenever jobs start or finish. The shared token bucket enforces
+    the global cap on top of that, including parallel fragment threads.
+    """
+
+    # How often running jobs check whether the time-of-day cap changed
+    SCHEDULE_CHECK_INTERVAL = 5
+
+    def __init__(self, limit=0, schedule=None):
+        self.limit = limit
+        self.schedule = schedule or []
+        self.bucket = TokenBucket(self.current_limit())
+        self._shares = {}
+        self._lock = threading.Lock()
+        self._active_limit = self.bucket.rate
+        self._last_check = time.monotonic()
+
+    def configure(self, limit=None, schedule=None):
+        """Update the default cap and time-of-day schedule"""
+        with self._lock:
+            if limit is not None:
+                self.limit = parse_rate(limit)
+            if schedule is not None:
+                self.schedule = parse_schedule(schedule) if isinstance(schedule, str) else schedule
+        self._rebalance()
+
+    def current_limit(self, now=None):
+        """Get the cap for the current time of day (0 = unlimited)"""
+        now = now or datetime.now()
+        minute = now.hour * 60 + now.minute
+        for start, end, rate in self.schedule:
+            if start <= end:
+                if start <= minute < end:
+                    return rate
+            elif minute >= start or minute < end:
+                # Span wraps past midnight
+                return rate
+        return self.limit
+
+    def start_job(self, job):
+        """Register a job and create its bandwidth share"""
+        share = BandwidthShare(self, job)
+        with self._lock:
+            self._shares[job.job_id] = share
+        self._rebalance()
+        return share
+
+    def finish_job(self, share):
+        """Hand a finished job's bandwidth back to the others"""
+        with self._lock:
+            self._shares.pop(share.job.job_id, None)
+        self._rebalance()
+
+    def _rebalance(self):
+        """Recompute the cap and every job's weighted share"""
+        limit = self.current_limit()
+        with self._lock:
+            self._active_limit = limit
+            shares = list(self._shares.values())
+        self.bucket.set_rate(limit)
+
+        total_weight = sum(share.job.weight for share in shares) or 1
+        for share in shares:
+            share.set_rate(int(limit * share.job.weight / total_weight) if limit else None)
+
+    def check_schedule(self):
+        """Apply a new time-of-day cap once its window starts"""
+        now = time.monotonic()
+        if now - self._last_check < self.SCHEDULE_CHECK_INTERVAL:
+            return
+        self._last_check = now
+        if self.current_limit() != self._active_limit:
+            self._rebalance()
+
+    def stats(self):
+        """Get current cap and shares"""
+        with self._lock:
+            return {
+                'limit': self._active_limit,
+                'jobs': len(self._shares),
+                'shares': {job_id: share.rate for job_id, share in self._shares.items()},
+            }
+
+
+class BandwidthShare:
+    """A job's slice of the global bandwidth, fed by the job's progress hook"""
+
+    # Longest single sleep, so cancellation is noticed quickly
+    MAX_SLEEP = 0.5
+
+    def __init__(self, manager, job):
+        self.manager = manager
+        self.job = job
+        self.rate = None
+        self._downloaded = {}
+
+    def overrides(self):
+        """yt-dlp params this session controls"""
+        return {'ratelimit': self.rate}
+
+    def set_rate(self, rate):
+        """Apply a new share to the running download"""
+        self.rate = rate
+        self.job.set_param('ratelimit', rate)
+
+    def finish(self):
+        """Release the share"""
+        self.manager.finish_job(self)
+
+    def on_progress(self, d):
+        """Charge newly received bytes to the global token bucket"""
+        if d.get('status') != 'downloading':
+            return
+
+        self.manager.check_schedule()
+
+        key = d.get('tmpfilename') or d.get('filename')
+        downloaded = d.get('downloaded_bytes') or 0
+        previous = self._downloaded.get(key, 0)
+        self._downloaded[key] = downloaded
+        if downloaded <= previous:
+            return
+
+        wait = self.manager.bucket.consume(downloaded - previous)
+        while wait > 0 and not self.job.cancelled:
+            time.sleep(min(wait, self.MAX_SLEEP))
+            wait -= self.MAX_SLEEP
+
+    def on_error(self):
+        """Bandwidth shares do not react to errors"""
+        pass
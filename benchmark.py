@@ -0,0 +1,165 @@
+"""Offline micro-benchmarks for the downloader internals
+
+Run with: python benchmark.py [iterations]
+"""
+import sys
+import time
+import yt_dlp
+from downloader import YouTubeDownloader
+from download_job import DownloadJob
+from download_errors import FragmentMissing, Forbidden
+
+
+def bench_ydl_setup(downloader, iterations=50):
+    """Compare per-URL YoutubeDL setup cost: fresh instance vs pooled checkout"""
+    print(f"YoutubeDL setup overhead per URL ({iterations} iterations)")
+
+    for profile in ['info', 'download', 'fallback', 'playlist_info']:
+        # Before: a new YoutubeDL for every call
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with yt_dlp.YoutubeDL(downloader._build_options(profile)) as ydl:
+                ydl.get_info_extractor('Youtube')
+        fresh = (time.perf_counter() - start) / iterations
+
+        # After: borrow a pooled instance for every call
+        start = time.perf_counter()
+        for _ in range(iterations):
+            with downloader.ydl_pool.checkout(profile) as ydl:
+                ydl.get_info_extractor('Youtube')
+        pooled = (time.perf_counter() - start) / iterations
+
+        print(f"  {profile:<10} fresh: {fresh * 1000:8.2f} ms   pooled: {pooled * 1000:8.2f} ms")
+
+
+def check_format_override(downloader):
+    """Check that a checkout's 'format' override changes the format yt-dlp picks"""
+    formats = [
+        {'format_id': '18', 'url': 'https://example.com/18', 'ext': 'mp4', 'height': 360,
+         'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 500},
+        {'format_id': '137', 'url': 'https://example.com/137', 'ext': 'mp4', 'height': 1080,
+         'vcodec': 'avc1', 'acodec': 'none', 'tbr': 4000},
+        {'format_id': '140', 'url': 'https://example.com/140', 'ext': 'm4a',
+         'vcodec': 'none', 'acodec': 'mp4a', 'tbr': 128},
+    ]
+
+    def chosen(overrides=None):
+        info = {'id': 'check', 'title': 'check', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': 'https://example.com/check', 'formats': [dict(f) for f in formats]}
+        with downloader.ydl_pool.checkout('download', overrides) as ydl:
+            return ydl.process_ie_result(info, download=False)['format_id']
+
+    before = chosen()
+    overridden = chosen({'format': '137+140'})
+    after = chosen()
+    assert overridden == '137+140', f"format override ignored, got {overridden}"
+    assert after == before, f"format override leaked into the next checkout, got {after}"
+    print(f"Format override: profile picks {before}, override picks {overridden}")
+
+
+def check_playlist_info_not_reused(downloader):
+    """Check that a download extracts a playlist again instead of reusing its sanitized info"""
+    entry = {'id': 'entry', 'title': 'entry', 'extractor': 'generic', 'extractor_key': 'Generic',
+             'webpage_url': 'https://example.com/entry',
+             'formats': [{'format_id': '18', 'url': 'https://example.com/18', 'ext': 'mp4', 'height': 360,
+                          'vcodec': 'avc1', 'acodec': 'mp4a'}]}
+    playlist = {'_type': 'playlist', 'id': 'list', 'title': 'list', 'extractor': 'generic',
+                'extractor_key': 'Generic', 'webpage_url': 'https://example.com/list', 'entries': [entry]}
+
+    # What reusing it would do: the sanitized copy has no entries left to process
+    with downloader.ydl_pool.checkout('download') as ydl:
+        try:
+            ydl.process_ie_result(ydl.sanitize_info(playlist, remove_private_keys=True), download=False)
+            reuse_error = None
+        except (yt_dlp.utils.DownloadError, yt_dlp.utils.EntryNotInPlaylist) as e:
+            reuse_error = str(e)
+    assert reuse_error and 'no entries' in reuse_error, f"sanitized playlist info processed, got {reuse_error}"
+
+    class RecordingYDL:
+        """Stands in for a checked-out instance, recording how the job is downloaded"""
+        def __init__(self, extracted):
+            self.extracted = extracted
+            self.calls = []
+
+        def sanitize_info(self, info, remove_private_keys=False):
+            return dict(info)
+
+        def extract_info(self, url, download=True, process=True):
+            self.calls.append('extract')
+            return dict(self.extracted)
+
+        def process_ie_result(self, info, download=True, extra_info=None):
+            self.calls.append(info.get('_type', 'video'))
+
+    # A playlist info from get_video_info is neither kept nor reused
+    job = DownloadJob('https://example.com/list', '.', info=playlist)
+    downloader._build_format_items(playlist, job)
+    ydl = RecordingYDL(playlist)
+    downloader._run_download(ydl, job)
+    assert ydl.calls == ['extract', 'playlist'], f"playlist info reused, calls {ydl.calls}"
+    assert job.info is playlist, "playlist job info replaced"
+    job.info = None
+    downloader._build_format_items(playlist, job)
+    assert job.info is None, "playlist info stored on the job"
+    downloader._run_download(ydl, job)
+    assert job.info is None, "extracted playlist info stored on the job"
+
+    # A single video's info still skips the second extraction
+    video = DownloadJob('https://example.com/entry', '.')
+    downloader._build_format_items(entry, video)
+    ydl = RecordingYDL(entry)
+    downloader._run_download(ydl, video)
+    assert ydl.calls == ['video'], f"video info not reused, calls {ydl.calls}"
+    print(f"Playlist info: extracted again on download (reuse would fail with \"{reuse_error.split(': ')[-1]}\")")
+
+
+def check_fallback_format(downloader):
+    """Check that the fallback attempts download the format they pick, not the fallback profile's"""
+    formats = [
+        {'format_id': '18', 'url': 'https://example.com/18', 'ext': 'mp4', 'height': 360,
+         'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 500},
+        {'format_id': '22', 'url': 'https://example.com/22', 'ext': 'mp4', 'height': 720,
+         'vcodec': 'avc1', 'acodec': 'mp4a', 'tbr': 1500},
+        {'format_id': '135', 'url': 'https://example.com/135', 'ext': 'mp4', 'height': 480,
+         'vcodec': 'avc1', 'acodec': 'none', 'tbr': 1200},
+        {'format_id': '140', 'url': 'https://example.com/140', 'ext': 'm4a',
+         'vcodec': 'none', 'acodec': 'mp4a', 'tbr': 128},
+    ]
+    info = {'id': 'check', 'title': 'check', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': 'https://example.com/check', 'formats': formats}
+
+    picked = []
+    def record_download(ydl, job):
+        """Select formats and the file name as the download would, without downloading"""
+        selected = ydl.process_ie_result(ydl.sanitize_info(job.info, remove_private_keys=True), download=False)
+        picked.append((selected['format_id'], ydl.prepare_filename(selected)))
+
+    with downloader.ydl_pool.checkout('fallback') as ydl:
+        profile_pick = ydl.process_ie_result(dict(info, formats=[dict(f) for f in formats]),
+                                             download=False)['format_id']
+
+    downloader._run_download = record_download
+    try:
+        job = DownloadJob('https://example.com/check', '.', "480p", info=dict(info))
+        downloader._attempt_download(job, [], 'example.com')
+        downloader._try_alternative_download(job, [], 'example.com', FragmentMissing("missing fragment"))
+        downloader._try_alternative_download(job, [], 'example.com', Forbidden("HTTP Error 403"))
+    finally:
+        del downloader._run_download
+    (first, _), (retry, _), (fallback, _) = picked
+    assert first == '135+140', f"480p picked {first}"
+    assert picked[1] == picked[0], f"retry after missing fragments picked {picked[1]}, first attempt {picked[0]}"
+    assert fallback == '18' != profile_pick, f"fallback picked {fallback}, fallback profile alone picks {profile_pick}"
+    print(f"Fallback format: first {first}, retry {retry}, fallback {fallback} (profile alone: {profile_pick})")
+
+
+if __name__ == "__main__":
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    downloader = YouTubeDownloader()
+    try:
+        check_format_override(downloader)
+        check_playlist_info_not_reused(downloader)
+        check_fallback_format(downloader)
+        bench_ydl_setup(downloader, iterations)
+    finally:
+        downloader.close()
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import threading
+from urllib.parse import urlparse
+
+DEFAULT_CHUNK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "chunk_sizes.json")
+
+
+def host_key(url):
+    """Group stream hosts by domain, e.g. rr3---sn-abc.googlevideo.com -> googlevideo.com"""
+    host = (urlparse(url).hostname or '') if url else ''
+    parts = host.split('.')
+    return '.'.join(parts[-2:]) if len(parts) >= 2 else host
+
+
+class ChunkSizeTuner:
+    """Picks http_chunk_size per job from measured throughput and latency, remembered per host"""
+
+    # Share of each chunk's time we accept spending on request latency
+    TARGET_OVERHEAD = 0.05
+    # Weight of a new measurement in the remembered per-host value
+    SMOOTHING = 0.5
+
+    def __init__(self, state_file=DEFAULT_CHUNK_FILE, default_size=1048576,
+                 min_size=262144, max_size=16777216):
+        self.state_file = state_file
+        self.default_size = default_size
+        self.min_size = min_size
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        # host -> {'chunk_size': bytes, 'updated': timestamp}
+        self.hosts = {}
+        self._load()
+
+    def _load(self):
+        """Load remembered chunk sizes"""
+        try:
+            if os.path.exists(self.state_file):
+                with open(self.state_file, 'r') as f:
+                    self.hosts = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading chunk sizes: {e}")
+            self.hosts = {}
+
+    def _save(self):
+        """Persist remembered chunk sizes"""
+        try:
+            tmp_file = self.state_file + ".tmp"
+            with open(tmp_file, 'w') as f:
+                json.dump(self.hosts, f)
+            os.replace(tmp_file, self.state_file)
+        except OSError as e:
+            print(f"Error saving chunk sizes: {e}")
+
+    def clamp(self, size):
+        """Keep a chunk size within bounds"""
+        return int(max(self.min_size, min(self.max_size, size)))
+
+    def size_for_host(self, host):
+        """Get the starting chunk size for a host"""
+        with self._lock:
+            entry = self.hosts.get(host) or self.hosts.get('*')
+            return self.clamp(entry['chunk_size']) if entry else self.default_size
+
+    def remember(self, host, size):
+        """Blend a job's chunk size into the host's remembered value"""
+        with self._lock:
+            for key in [host, '*'] if host else ['*']:
+                entry = self.hosts.get(key)
+                if entry:
+                    size_to_store = entry['chunk_size'] * (1 - self.SMOOTHING) + size * self.SMOOTHING
+                else:
+                    size_to_store = size
+                self.hosts[key] = {'chunk_size': self.clamp(size_to_store), 'updated': time.time()}
+            self._save()
+
+    def start_job(self, job):
+        """Create the tuning session for a job"""
+        host = None
+        info = job.info or {}
+        for fmt in info.get('requested_formats') or info.get('formats') or []:
+            if fmt.get('url'):
+                host = host_key(fmt['url'])
+                break
+        return ChunkTuning(self, job, host, self.size_for_host(host))
+
+
+class ChunkTuning:
+    """Per-job chunk size state, fed by the job's progress hook
+
+    yt-dlp fixes the chunk size when an HTTP stream starts, so a new size
+    applies to the job's next stream and is remembered for the host.
+    """
+
+    def __init__(self, tuner, job, host, chunk_size):
+        self.tuner = tuner
+        self.job = job
+        self.host = host
+        self.chunk_size = chunk_size
+        self.error_count = 0
+        self.measured = False
+        self._latency = None
+
+    def overrides(self):
+        """yt-dlp params this session controls"""
+        return {'http_chunk_size': self.chunk_size}
+
+    def finish(self):
+        """Remember what worked for this host"""
+        if self.measured or self.error_count:
+            self.tuner.remember(self.host, self.chunk_size)
+
+    def on_progress(self, d):
+        """Measure latency and throughput of plain HTTP streams"""
+        # Fragmented streams are tuned by fragment concurrency instead
+        if d.get('fragment_count'):
+            return
+
+        if self.host is None and d.get('info_dict', {}).get('url'):
+            self.host = host_key(d['info_dict']['url'])
+
+        elapsed = d.get('elapsed')
+        if d.get('status') == 'downloading':
+            # Time until the first bytes arrive approximates the per-request latency
+            if self._latency is None and elapsed and d.get('downloaded_bytes'):
+                self._latency = elapsed
+        elif d.get('status') == 'finished':
+            total = d.get('total_bytes') or d.get('downloaded_bytes')
+            if elapsed and total and self._latency:
+                self._evaluate(total / elapsed, self._latency)
+            self._latency = None
+
+    def _evaluate(self, throughput, latency):
+        """Size chunks so request latency stays a small share of each chunk's time"""
+        self.measured = True
+        wanted = throughput * latency / self.tuner.TARGET_OVERHEAD
+        if self.error_count:
+            # Flaky link: never grow past the current size
+            wanted = min(wanted, self.chunk_size)
+        self._set_size(wanted)
+
+    def on_error(self):
+        """Halve the chunk size so retries waste less data"""
+        self.error_count += 1
+        self._set_size(self.chunk_size / 2)
+
+    def _set_size(self, size):
+        """Apply a new chunk size to the running download"""
+        self.chunk_size = self.tuner.clamp(size)
+        self.job.set_param('http_chunk_size', self.chunk_size)
@@ -0,0 +1,97 @@
+import os
+import time
+import threading
+import http.cookiejar
+import requests
+
+DEFAULT_COOKIE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "cookies.txt")
+
+
+class CookieStore:
+    """YouTube cookie jar kept across runs and refreshed in the background when stale"""
+
+    def __init__(self, user_agent_factory, cookies_file=DEFAULT_COOKIE_FILE, refresh_margin=24 * 3600):
+        self.user_agent_factory = user_agent_factory
+        self.cookies_file = cookies_file
+        # Refresh when any cookie expires within this many seconds
+        self.refresh_margin = refresh_margin
+        self._ready = threading.Event()
+        self._lock = threading.Lock()
+        self._refresh_thread = None
+
+        # yt-dlp rejects cookie files without the Netscape header
+        if not os.path.exists(self.cookies_file) or os.path.getsize(self.cookies_file) == 0:
+            with open(self.cookies_file, 'w') as f:
+                f.write("# Netscape HTTP Cookie File\n")
+
+        if not self.is_stale():
+            self._ready.set()
+
+    def _load_jar(self):
+        """Load the cookie jar from disk"""
+        jar = http.cookiejar.MozillaCookieJar(self.cookies_file)
+        try:
+            jar.load(ignore_discard=True, ignore_expires=True)
+        except (OSError, http.cookiejar.LoadError) as e:
+            print(f"Error loading cookies: {e}")
+        return jar
+
+    def is_stale(self):
+        """Check whether the stored cookies are missing or about to expire"""
+        cookies = list(self._load_jar())
+        if not cookies:
+            return True
+        deadline = time.time() + self.refresh_margin
+        return any(cookie.expires is not None and cookie.expires < deadline for cookie in cookies)
+
+    def refresh_in_background(self):
+        """Start a background refresh if the cookies are stale"""
+        with self._lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            if not self.is_stale():
+                self._ready.set()
+                return
+            self._ready.clear()
+            self._refresh_thread = threading.Thread(target=self._refresh, daemon=True)
+            self._refresh_thread.start()
+
+    def wait_ready(self, timeout=15):
+        """Wait for a pending refresh, returns False if it did not finish in time"""
+        return self._ready.wait(timeout)
+
+    def _refresh(self):
+        """Visit the YouTube homepage and store the cookies it sets"""
+        try:
+            headers = {
+                'User-Agent': self.user_agent_factory(),
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.5',
+                'DNT': '1',
+                'Connection': 'keep-alive',
+                'Upgrade-Insecure-Requests': '1',
+                'Sec-Fetch-Dest': 'document',
+                'Sec-Fetch-Mode': 'navigate',
+                'Sec-Fetch-Site': 'none',
+                'Sec-Fetch-User': '?1',
+            }
+
+            session = requests.Session()
+            session.headers.update(headers)
+            session.get('https://www.youtube.com/', timeout=30)
+
+            # Merge into the existing jar so cookies the server did not resend are kept
+            jar = self._load_jar()
+            for cookie in session.cookies:
+                jar.set_cookie(cookie)
+            jar.clear_expired_cookies()
+
+            # Write to a temporary file first so a crash never leaves a truncated jar
+            tmp_file = self.cookies_file + ".tmp"
+            jar.save(tmp_file, ignore_discard=True, ignore_expires=True)
+            os.replace(tmp_file, self.cookies_file)
+        except Exception as e:
+            print(f"Error getting YouTube cookies: {e}")
+        finally:
+            # Downloads go ahead with whatever cookies we have
+            self._ready.set()
@@ -0,0 +1,129 @@
+import os
+import time
+import sqlite3
+import threading
+
+DEFAULT_ARCHIVE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_archive.db")
+
+# Scope used when the archive is shared by all output folders
+GLOBAL_SCOPE = '*'
+
+
+class DownloadArchive:
+    """On-disk index of downloaded video IDs, per output folder or global
+
+    Membership checks go to an in-memory set per scope, loaded from SQLite
+    the first time the scope is used.
+    """
+
+    def __init__(self, db_path=DEFAULT_ARCHIVE_FILE, mode="folder"):
+        # "folder", "global" or "off"
+        self.mode = mode
+        self.hits = 0
+        self._scopes = {}
+        self._lock = threading.Lock()
+        self._db = None
+
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                "scope TEXT NOT NULL, video_id TEXT NOT NULL, downloaded_at REAL NOT NULL, "
+                "PRIMARY KEY (scope, video_id))"
+            )
+            self._db.commit()
+        except sqlite3.Error as e:
+            # Keep an in-memory archive for this session only
+            print(f"Error opening download archive: {e}")
+            self._db = None
+
+    def configure(self, mode=None):
+        """Change whether the archive is kept per folder, globally or not at all"""
+        if mode is not None:
+            if mode not in ("folder", "global", "off"):
+                raise ValueError(f"Invalid download archive mode: {mode}")
+            self.mode = mode
+
+    def scope_for(self, folder):
+        """Get the archive scope of an output folder, or None when the archive is off"""
+        if self.mode == "off":
+            return None
+        if self.mode == "global":
+            return GLOBAL_SCOPE
+        return os.path.normcase(os.path.abspath(folder))
+
+    def _ids(self, scope):
+        """Get the ID set of a scope, loading it on first use (lock must be held)"""
+        ids = self._scopes.get(scope)
+        if ids is None:
+            ids = set()
+            if self._db is not None:
+                try:
+                    rows = self._db.execute("SELECT video_id FROM archive WHERE scope = ?", (scope,))
+                    ids.update(row[0] for row in rows)
+                except sqlite3.Error as e:
+                    print(f"Error reading download archive: {e}")
+            self._scopes[scope] = ids
+        return ids
+
+    def contains(self, folder, video_id):
+        """Whether a video was already downloaded into the folder's scope"""
+        scope = self.scope_for(folder)
+        if scope is None or not video_id:
+            return False
+        with self._lock:
+            found = video_id in self._ids(scope)
+            if found:
+                self.hits += 1
+            return found
+
+    def add(self, folder, video_id):
+        """Record a completed download"""
+        scope = self.scope_for(folder)
+        if scope is None or not video_id:
+            return
+        with self._lock:
+            ids = self._ids(scope)
+            if video_id in ids:
+                return
+            ids.add(video_id)
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO archive (scope, video_id, downloaded_at) VALUES (?, ?, ?)",
+                        (scope, video_id, time.time())
+                    )
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing download archive: {e}")
+
+    def remove(self, folder, video_id):
+        """Forget a download, so the next sync fetches it again"""
+        scope = self.scope_for(folder)
+        if scope is None:
+            return
+        with self._lock:
+            self._ids(scope).discard(video_id)
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM archive WHERE scope = ? AND video_id = ?", (scope, video_id))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing download archive: {e}")
+
+    def stats(self):
+        """Get archive counters"""
+        with self._lock:
+            return {
+                'mode': self.mode,
+                'hits': self.hits,
+                'loaded_scopes': len(self._scopes),
+                'loaded_ids': sum(len(ids) for ids in self._scopes.values()),
+            }
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,117 @@
+import socket
+from yt_dlp.utils import GeoRestrictedError
+from yt_dlp.networking.exceptions import HTTPError, TransportError
+from retry_policy import is_rate_limited
+
+
+class DownloadFailure(Exception):
+    """A failed extraction or download, classified once from the yt-dlp error
+
+    Subclasses name the kind of failure; this base class is used for
+    failures that fit none of them.
+    """
+
+    # Message shown to the user, None to show the underlying error
+    summary = None
+
+    def __init__(self, message, cause=None):
+        super().__init__(message)
+        self.message = message
+        self.cause = cause
+
+    @property
+    def kind(self):
+        return type(self).__name__
+
+    def describe(self, prefix="Error"):
+        """Get the message shown for this failure"""
+        return self.summary or f"{prefix}: {self.message}"
+
+
+class RateLimited(DownloadFailure):
+    summary = "YouTube rate limit exceeded. Please try again later."
+
+
+class Forbidden(DownloadFailure):
+    summary = "Access forbidden. YouTube may be blocking this request."
+
+
+class Unavailable(DownloadFailure):
+    summary = "This video is unavailable or may be private."
+
+
+class GeoBlocked(DownloadFailure):
+    summary = "This video is not available in your country."
+
+
+class FragmentMissing(DownloadFailure):
+    summary = "Part of the video stream could not be downloaded."
+
+
+class TransientNetwork(DownloadFailure):
+    summary = "Network error. Please try again."
+
+
+class ApiError(DownloadFailure):
+    summary = "YouTube API error. Try updating yt-dlp or try again later."
+
+
+# Message fragments of failures that carry no typed cause, checked in order
+MESSAGE_PATTERNS = [
+    (GeoBlocked, ("not available in your country", "geo restrict", "blocked it in your country")),
+    (Unavailable, ("Video unavailable", "This video is unavailable", "Private video", "has been removed",
+                   "account associated with this video has been terminated", "This video is private")),
+    (ApiError, ("Precondition check failed",)),
+    (Forbidden, ("HTTP Error 403",)),
+    (TransientNetwork, ("timed out", "Connection reset", "Connection refused", "Remote end closed",
+                        "Temporary failure in name resolution", "IncompleteRead", "HTTP Error 5")),
+]
+
+
+def _causes(error):
+    """Yield an error and the exceptions it wraps, outermost first"""
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        yield error
+        exc_info = getattr(error, 'exc_info', None)
+        if exc_info and exc_info[1] is not None and exc_info[1] is not error:
+            error = exc_info[1]
+        else:
+            error = getattr(error, 'cause', None) or error.__cause__ or error.__context__
+
+
+def _is_fragment_error(message):
+    message = message.lower()
+    return "fragment" in message and ("not found" in message or "http error 404" in message)
+
+
+def classify(error):
+    """Turn any extraction/download exception into a DownloadFailure subclass"""
+    if isinstance(error, DownloadFailure):
+        return error
+    message = str(error)
+
+    # Rate limiting and missing fragments first: their causes look like plain HTTP errors
+    if is_rate_limited(message):
+        return RateLimited(message, error)
+    if _is_fragment_error(message):
+        return FragmentMissing(message, error)
+
+    for cause in _causes(error):
+        if isinstance(cause, GeoRestrictedError):
+            return GeoBlocked(message, error)
+        if isinstance(cause, HTTPError):
+            if cause.status == 429:
+                return RateLimited(message, error)
+            if cause.status == 403:
+                return Forbidden(message, error)
+            if cause.status >= 500:
+                return TransientNetwork(message, error)
+        elif isinstance(cause, (TransportError, socket.timeout, ConnectionError)):
+            return TransientNetwork(message, error)
+
+    for failure_class, patterns in MESSAGE_PATTERNS:
+        if any(pattern in message for pattern in patterns):
+            return failure_class(message, error)
+    return DownloadFailure(message, error)
@@ -0,0 +1,175 @@
+import itertools
+import threading
+
+# Process-wide job ID sequence
+_job_ids = itertools.count(1)
+
+
+class DownloadJob:
+    """State owned by a single download: formats, progress callback, cancel token and options"""
+
+    def __init__(self, url, output_path, format_choice="best", filename_template="%(title)s",
+                 progress_callback=None, info=None, options=None, weight=1.0, playlist=False,
+                 extra_info=None, parent=None):
+        self.job_id = next(_job_ids)
+        self.url = url
+        self.output_path = output_path
+        self.format_choice = format_choice
+        self.filename_template = filename_template
+        self.progress_callback = progress_callback
+        # Whether the URL is downloaded as a whole playlist
+        self.playlist = playlist
+        # Info from get_video_info, lets the download skip a second extraction
+        self.info = info
+        # Fields added to the extracted info, e.g. playlist_index of a playlist entry
+        self.extra_info = dict(extra_info or {})
+        # FormatIndex of the job's extracted info, for format selection
+        self.format_index = None
+        # Bytes the job is expected to download, when known
+        self.estimated_size = None
+        # DownloadFailure of the last failed attempt
+        self.error = None
+        # Extra yt-dlp params applied on top of the pooled profile
+        self.options = dict(options or {})
+        # Relative share of the global bandwidth cap
+        self.weight = weight
+        # Params of the YoutubeDL instance while the job holds one, for live tuning
+        self.params = None
+        self._tunable_keys = set()
+        # Extra progress listeners (tuners, schedulers) called before the UI callback
+        self.observers = []
+        # Merges of this job still running in the post-processing stage
+        self.postprocessing = []
+        # Key of the job's journal entry, if it is journaled
+        self.journal_key = None
+        # Partial file the job is currently writing (yt-dlp resumes from it)
+        self.part_file = None
+        # Entries of a playlist share the playlist job's cancel token
+        self._cancel_event = parent._cancel_event if parent else threading.Event()
+
+    def cancel(self):
+        """Request cancellation of this job only"""
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """Whether cancellation was requested"""
+        return self._cancel_event.is_set()
+
+    def wait_cancelled(self, timeout):
+        """Sleep up to timeout seconds, waking early if the job is cancelled"""
+        return self._cancel_event.wait(timeout)
+
+    def attach(self, ydl, tunable_keys):
+        """Bind the job to the YoutubeDL instance running it"""
+        self._tunable_keys = set(tunable_keys)
+        self.params = ydl.params
+
+    def detach(self):
+        """Unbind the job once its YoutubeDL instance goes back to the pool"""
+        self.params = None
+        self._tunable_keys = set()
+
+    def set_param(self, key, value):
+        """Change a yt-dlp param of the running download
+
+        yt-dlp downloaders share the params dict, so the value is picked up
+        wherever yt-dlp reads it next. Only keys passed as checkout overrides
+        are restored by the pool, so only those may be changed.
+        """
+        params = self.params
+        if params is not None and key in self._tunable_keys:
+            params[key] = value
+
+    def add_observer(self, observer):
+        """Register an extra progress listener"""
+        self.observers.append(observer)
+
+    def progress_hook(self, d):
+        """Handle progress updates from yt-dlp for this job"""
+        if self.cancelled:
+            raise Exception("Download canceled by user")
+
+        for observer in self.observers:
+            observer(d)
+
+        if self.progress_callback:
+            self.progress_callback(d)
+
+
+class PlaylistProgress:
+    """Combines the progress of parallel playlist entries for the playlist job's callback
+
+    Every update is forwarded with playlist_index, playlist_count (entries
+    found so far), playlist_enumerated, playlist_completed, playlist_failed,
+    playlist_skipped and playlist_progress (0-1) added.
+    """
+
+    def __init__(self, job):
+        self.job = job
+        self.count = 0
+        self.enumerated = False
+        self.completed = 0
+        self.failed = 0
+        # Entries found in the download archive
+        self.skipped = 0
+        self.first_error = None
+        # playlist index -> fraction done of entries still downloading
+        self._running = {}
+        self._lock = threading.Lock()
+
+    def add_entry(self):
+        """Count an entry found by the enumeration"""
+        with self._lock:
+            self.count += 1
+
+    def enumeration_done(self):
+        """Mark the entry count as final"""
+        with self._lock:
+            self.enumerated = True
+
+    def entry_skipped(self, index):
+        """Count an entry that needs no download"""
+        with self._lock:
+            self.count += 1
+            self.completed += 1
+            self.skipped += 1
+        self._report({'status': 'entry_skipped'}, index)
+
+    def callback(self, index):
+        """Build the progress callback of one entry"""
+        def forward(d):
+            if d.get('status') == 'downloading':
+                total = d.get('total_bytes') or d.get('total_bytes_estimate')
+                if total:
+                    with self._lock:
+                        self._running[index] = min(1.0, (d.get('downloaded_bytes') or 0) / total)
+            self._report(d, index)
+        return forward
+
+    def entry_done(self, index, success, message=None):
+        """Count a finished entry"""
+        with self._lock:
+            self._running.pop(index, None)
+            self.completed += 1
+            if not success:
+                self.failed += 1
+                self.first_error = self.first_error or message
+        self._report({'status': 'entry_finished', 'success': success}, index)
+
+    def _report(self, d, index):
+        """Forward an update to the playlist job's callback"""
+        if not self.job.progress_callback:
+            return
+        with self._lock:
+            overall = (self.completed + sum(self._running.values())) / max(1, self.count)
+            fields = {
+                'playlist_index': index,
+                'playlist_count': self.count,
+                'playlist_enumerated': self.enumerated,
+                'playlist_completed': self.completed,
+                'playlist_failed': self.failed,
+                'playlist_skipped': self.skipped,
+                'playlist_progress': overall,
+            }
+        self.job.progress_callback(dict(d, **fields))
@@ -1,20 +1,64 @@
 import os
+import shutil
 import yt_dlp
 import random
-import tempfile
-import requests
-import time
-from pathlib import Path
+import threading
 import logging
+from concurrent.futures import wait as wait_futures
+from ydl_pool import YoutubeDLPool
+from download_job import DownloadJob, PlaylistProgress
+from fragment_tuner import FragmentConcurrencyController
+from chunk_tuner import ChunkSizeTuner
+from bandwidth import BandwidthManager
+from cookie_store import CookieStore
+from metadata_cache import MetadataCache
+from url_utils import extract_video_id, names_playlist, canonicalize_url, dedupe_urls
+from postprocessing import PostProcessingStage, merge_plan
+from job_journal import JobJournal
+from download_archive import DownloadArchive
+from format_index import FormatIndex
+from retry_policy import RetryPolicy, policy_host
+from download_errors import (DownloadFailure, RateLimited, Forbidden, Unavailable, GeoBlocked, FragmentMissing,
+                             TransientNetwork, ApiError, classify)
+
+def _is_video_info(info):
+    """Whether extracted info is a single video, which a download can reuse
+
+    sanitize_info drops the entries of a playlist info, so processing a
+    reused playlist info again fails with "There are no entries".
+    """
+    return bool(info) and info.get('_type', 'video') == 'video'
+
 
 class YouTubeDownloader:
+    # What a failed download does next, per error class:
+    # retry the same attempt, fall back to the alternative method, or give up
+    ERROR_ROUTES = {
+        RateLimited: 'retry',  # after the host's shared backoff
+        TransientNetwork: 'retry',
+        Forbidden: 'fallback',
+        FragmentMissing: 'fallback',
+        Unavailable: 'fail',
+        GeoBlocked: 'fail',
+        ApiError: 'fail',
+        DownloadFailure: 'fail',
+    }
+    # Retries of one job before a retryable failure is reported
+    MAX_RETRIES = 2
+    
     def __init__(self):
         # Configure yt-dlp logger to suppress specific warnings
         self._configure_logger()
         
-        self.formats = []
+        # Default callback for jobs started through download_video
         self.progress_callback = None
-        self.should_cancel = False
+        # Playlist entries queued or downloading at the same time per playlist
+        self.playlist_concurrency = 3
+        # JobEngine whose transfer limit playlist entries queue under, set by the GUI
+        self.engine = None
+        # Jobs currently running, so cancel_download can reach all of them
+        self.active_jobs = set()
+        self._jobs_lock = threading.Lock()
         # Common user agents to simulate real browsers
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
@@ -22,13 +66,29 @@ class YouTubeDownloader:
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Edge/121.0.0.0 Safari/537.36',
         ]
-        # Create temp directory for cookies
-        self.temp_dir = tempfile.mkdtemp()
-        self.cookies_file = os.path.join(self.temp_dir, 'cookies.txt')
-        # Create empty cookies file
-        Path(self.cookies_file).touch()
-        # Get YouTube home page to obtain cookies
-        self._get_youtube_cookies()
+        # Cookies persist across runs; a stale jar is refreshed without blocking startup
+        self.cookie_store = CookieStore(self.get_random_user_agent)
+        self.cookies_file = self.cookie_store.cookies_file
+        self.cookie_store.refresh_in_background()
+        # Reusable YoutubeDL instances, one set per option profile; instances are created on
+        # demand, up to one per job engine thread (e.g. the info gatherer's parallel lookups)
+        self.ydl_pool = YoutubeDLPool(self._build_options, max_per_profile=16)
+        # Extraction results shared by the downloader, batch and info gatherer
+        self.metadata_cache = MetadataCache()
+        # Adaptive fragment concurrency for DASH/HLS downloads
+        self.fragment_controller = FragmentConcurrencyController()
+        # HTTP chunk sizes tuned from throughput and latency, remembered per host
+        self.chunk_tuner = ChunkSizeTuner()
+        # Global bandwidth cap shared by every download path
+        self.bandwidth = BandwidthManager()
+        # Merges run in worker processes while downloads move on
+        self.postprocessing = PostProcessingStage()
+        # Write-ahead record of queued and running jobs, replayed after a crash
+        self.journal = JobJournal()
+        # Video IDs already downloaded, so playlist syncs only fetch new entries
+        self.archive = DownloadArchive()
+        # Backoff and circuit breakers shared by every worker, so one 429 pauses the whole host
+        self.retry_policy = RetryPolicy()
     
     def _configure_logger(self):
         """Configure yt-dlp logger to suppress specific warnings"""
@@ -55,268 +115,652 @@ class YouTubeDownloader:
             handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
             ytdlp_logger.addHandler(handler)
     
-    def _get_youtube_cookies(self):
-        """Get YouTube cookies to use with requests"""
-        try:
-            user_agent = self.get_random_user_agent()
-            headers = {
-                'User-Agent': user_agent,
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Sec-Fetch-Dest': 'document',
-                'Sec-Fetch-Mode': 'navigate',
-                'Sec-Fetch-Site': 'none',
-                'Sec-Fetch-User': '?1',
-            }
-            
-            session = requests.Session()
-            session.headers.update(headers)
-            
-            # Visit YouTube homepage to get cookies
-            response = session.get('https://www.youtube.com/')
-            
-            # Write cookies to file in Netscape format
-            with open(self.cookies_file, 'w') as f:
-                f.write("# Netscape HTTP Cookie File\n")
-                for cookie in session.cookies:
-                    f.write(f".youtube.com\tTRUE\t/\tFALSE\t{int(time.time()) + 3600*24*30}\t{cookie.name}\t{cookie.value}\n")
-            
-            return True
-        except Exception as e:
-            print(f"Error getting YouTube cookies: {e}")
-            return False
-    
     def get_random_user_agent(self):
         """Get a random user agent to avoid detection"""
         return random.choice(self.user_agents)
-    
+
+    def _build_options(self, profile):
+        """Build yt-dlp options for a pooled YoutubeDL profile"""
+        # Instances are only built when a job needs one, so this is the first point cookies matter
+        if not self.cookie_store.wait_ready():
+            print("Cookie refresh is taking too long, continuing with stored cookies")
+        
+        extractor_args = {
+            'youtube': {
+                'player_client': ['android', 'web', 'mobile'],
+                'player_skip': [],  # Don't skip any player extraction
+                'formats': 'missing_pot'  # Allow formats even if PO token is missing
+            }
+        }
+        http_headers = {
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+            'Accept-Language': 'en-US,en;q=0.5',
+            'Origin': 'https://www.youtube.com',
+            'Referer': 'https://www.youtube.com/'
+        }
+
+        if profile == 'info':
+            # Enhanced options for 2025.03.26 version
+            return {
+                'quiet': False,  # Changed to allow logging
+                'no_warnings': True,  # Suppress warnings via the logger
+                # One broken playlist entry must not fail the whole lookup, errors are classified from the log
+                'ignoreerrors': True,
+                'cookiefile': self.cookies_file,
+                'no_color': True,
+                'geo_bypass': True,
+                'extractor_args': extractor_args,
+                'socket_timeout': 30,
+                'user_agent': self.get_random_user_agent(),
+                'http_headers': http_headers,
+                'retry_sleep_functions': self.retry_policy.sleep_functions(),
+                'logger': logging.getLogger("yt_dlp")  # Use our configured logger
+            }
+        elif profile == 'download':
+            # Enhanced options for version 2025.03.26
+            return {
+                'format': 'best',
+                'cookiefile': self.cookies_file,
+                'quiet': True,
+                'no_warnings': False,
+                # Errors are raised so they can be classified and routed
+                'ignoreerrors': False,
+                'no_color': True,
+                'geo_bypass': True,
+                'extractor_args': extractor_args,
+                'socket_timeout': 30,
+                'user_agent': self.get_random_user_agent(),
+                'http_chunk_size': 1048576,  # 1MB chunks
+                'youtube_include_dash_manifest': False,
+                'http_headers': http_headers,
+                'retry_sleep_functions': self.retry_policy.sleep_functions(),
+                'retries': 15,
+                'fragment_retries': 15,
+                'concurrent_fragment_downloads': 1,
+                'merge_output_format': 'mp4',
+                'allow_unplayable_formats': True  # New in recent yt-dlp versions
+            }
+        elif profile == 'fallback':
+            # Different options for a second attempt - optimized for 2025.03.26
+            return {
+                'format': 'best[ext=mp4]/best',
+                'cookiefile': self.cookies_file,
+                'quiet': True,
+                # Errors are raised so they can be classified and routed
+                'ignoreerrors': False,
+                'geo_bypass': True,
+                'user_agent': self.get_random_user_agent(),
+                'http_chunk_size': 524288,
+                'retry_sleep_functions': self.retry_policy.sleep_functions(),
+                'retries': 20,
+                'fragment_retries': 20,
+                'hls_prefer_native': True,
+                'concurrent_fragment_downloads': 1,
+                'allow_unplayable_formats': True,
+                'extractor_retries': 10,
+                'file_access_retries': 10
+            }
+        elif profile == 'playlist_info':
+            # Options for playlist detection
+            return {
+                'quiet': True,
+                'no_warnings': False,
+                'extract_flat': True,
+                'cookiefile': self.cookies_file,
+                'user_agent': self.get_random_user_agent(),
+            }
+        raise ValueError(f"Unknown YoutubeDL profile: {profile}")
+
     def set_progress_callback(self, callback):
-        """Set callback function for progress updates"""
+        """Set default callback for progress updates of download_video"""
         self.progress_callback = callback
     
+    def set_engine(self, engine):
+        """Queue playlist entries under the engine's transfer limit, like every other download"""
+        self.engine = engine
+    
     def cancel_download(self):
-        """Cancel ongoing download"""
-        self.should_cancel = True
-    
-    def reset_cancel_flag(self):
-        """Reset download cancellation flag"""
-        self.should_cancel = False
-    
-    def get_video_info(self, url):
-        """Get video information without downloading"""
-        self.formats = []
-        
-        # Enhanced options for 2025.03.26 version
-        ydl_opts = {
-            'quiet': False,  # Changed to allow logging
-            'no_warnings': True,  # Suppress warnings via the logger
-            'ignoreerrors': True,
-            'cookiefile': self.cookies_file,
-            'no_color': True,
-            'geo_bypass': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web', 'mobile'],
-                    'player_skip': [],  # Don't skip any player extraction
-                    'formats': 'missing_pot'  # Allow formats even if PO token is missing
-                }
-            },
-            'socket_timeout': 30,
-            'user_agent': self.get_random_user_agent(),
-            'http_headers': {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Origin': 'https://www.youtube.com',
-                'Referer': 'https://www.youtube.com/'
-            },
-            'logger': logging.getLogger("yt_dlp")  # Use our configured logger
-        }
+        """Cancel every ongoing download"""
+        with self._jobs_lock:
+            jobs = list(self.active_jobs)
+        for job in jobs:
+            job.cancel()
+    
+    def configure(self, settings):
+        """Apply user settings to the downloader"""
+        try:
+            self.metadata_cache.configure(
+                memory_ttl=int(settings.get("cache_memory_ttl", self.metadata_cache.memory_ttl)),
+                disk_ttl=int(settings.get("cache_disk_ttl", self.metadata_cache.disk_ttl)),
+                max_memory_entries=int(settings.get("cache_max_memory_entries", self.metadata_cache.max_memory_entries)),
+                max_disk_entries=int(settings.get("cache_max_disk_entries", self.metadata_cache.max_disk_entries)),
+            )
+        except (TypeError, ValueError) as e:
+            print(f"Invalid cache settings: {e}")
+        
+        try:
+            # Every concurrent download holds one pooled instance
+            concurrent_downloads = int(settings.get("max_concurrent_downloads", 2))
+            self.playlist_concurrency = max(1, int(settings.get("playlist_concurrency", self.playlist_concurrency)))
+            self.ydl_pool.max_per_profile = max(self.ydl_pool.max_per_profile, concurrent_downloads,
+                                                self.playlist_concurrency)
+            self.fragment_controller.configure(
+                per_job_limit=int(settings.get("fragment_concurrency", self.fragment_controller.per_job_limit)),
+                global_limit=int(settings.get("max_fragment_concurrency", self.fragment_controller.global_limit)),
+            )
+        except (TypeError, ValueError) as e:
+            print(f"Invalid concurrency setting: {e}")
+        
+        try:
+            self.bandwidth.configure(
+                limit=settings.get("bandwidth_limit", 0),
+                schedule=settings.get("bandwidth_schedule", ""),
+            )
+        except (TypeError, ValueError) as e:
+            print(f"Invalid bandwidth settings: {e}")
         
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            self.archive.configure(mode=settings.get("download_archive", self.archive.mode))
+        except ValueError as e:
+            print(f"Invalid download archive setting: {e}")
+    
+    def close(self):
+        """Release pooled YoutubeDL instances and the metadata cache, finishing queued merges"""
+        # Jobs interrupted from here on stay unfinished in the journal and are resumed next time
+        self.journal.close()
+        self.ydl_pool.close()
+        self.metadata_cache.close()
+        self.postprocessing.shutdown()
+        # After the merges, which archive their videos when done
+        self.archive.close()
+    
+    def get_video_info(self, url, use_cache=True, job=None):
+        """Get video information without downloading
+        
+        Returns (success, info or error message, format dropdown entries).
+        If a job is given, the info and its format index are stored on the job.
+        """
+        # Serve repeated lookups of the same video from the metadata cache. A watch URL
+        # with list= extracts as its playlist, so it never gets the cached video
+        video_id = extract_video_id(url)
+        if use_cache and video_id and not names_playlist(url):
+            info = self.metadata_cache.get(video_id)
+            if info is not None:
+                return True, info, self._build_format_items(info, job)
+        
+        # Waits here while the host is rate limited
+        host = policy_host(url)
+        if not self.retry_policy.acquire(host, (lambda: job.cancelled) if job is not None else None):
+            return False, "Canceled", []
+        try:
+            overrides = self._rate_limit_overrides(host)
+            with self.ydl_pool.checkout('info', overrides) as ydl:
                 info = ydl.extract_info(url, download=False)
                 
                 if not info:
-                    return False, "Could not retrieve video information. The video may be unavailable or restricted.", []
-                
-                # Get available formats
-                format_items = ["best", "1080p", "720p", "480p", "360p", "audio only"]
+                    last_error = overrides['logger'].last_error
+                    if last_error is None:
+                        return False, "Could not retrieve video information. The video may be unavailable or restricted.", []
+                    raise yt_dlp.utils.DownloadError(last_error)
+                self.retry_policy.record_success(host)
                 
-                if 'formats' in info:
-                    for f in info['formats']:
-                        format_id = f.get('format_id', '')
-                        extension = f.get('ext', '')
-                        resolution = f.get('resolution', 'N/A')
-                        note = f.get('format_note', '')
-                        
-                        if note or resolution != 'N/A':
-                            format_str = f"{format_id} - {extension} - {resolution} - {note}"
-                            self.formats.append({
-                                'id': format_id, 
-                                'ext': extension,
-                                'resolution': resolution,
-                                'note': note,
-                                'str': format_str
-                            })
-                            format_items.append(format_str)
+                # Only single videos are cached, playlists change too often
+                if video_id and info.get('_type', 'video') == 'video':
+                    self.metadata_cache.put(video_id, ydl.sanitize_info(info))
                 
-                return True, info, format_items
+                return True, info, self._build_format_items(info, job)
         except yt_dlp.utils.DownloadError as e:
-            error_message = str(e)
-            if "HTTP Error 429" in error_message:
-                return False, "YouTube rate limit exceeded. Please try again later.", []
-            elif "HTTP Error 403" in error_message:
-                return False, "Access forbidden. YouTube may be blocking this request.", []
-            elif "Precondition check failed" in error_message:
-                return False, "YouTube API error. Try updating yt-dlp or try a different video.", []
-            elif "This video is unavailable" in error_message:
-                return False, "This video is unavailable or may be private.", []
-            else:
-                return False, f"Error: {error_message}", []
+            failure = classify(e)
+            if job is not None:
+                job.error = failure
+            if isinstance(failure, RateLimited):
+                self.retry_policy.record_rate_limit(host)
+            return False, failure.describe(), []
         except Exception as e:
             return False, f"Error: {str(e)}", []
+        finally:
+            self.retry_policy.release(host)
     
-    def download_video(self, url, output_path, format_choice, filename_template="%(title)s"):
-        """Download YouTube video using yt-dlp with custom filename template"""
-        # Determine format based on selection
-        if format_choice == "audio only":
-            format_option = "bestaudio[ext=m4a]/bestaudio/best"
-        elif format_choice in ["best", "1080p", "720p", "480p", "360p"]:
-            if format_choice == "best":
-                format_option = "bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best"
-            else:
-                height = format_choice[:-1]
-                format_option = f"bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}][ext=mp4]/best"
+    def _rate_limit_overrides(self, host):
+        """Params that report 429s to the shared retry policy and take its backoff between retries"""
+        logger = self.retry_policy.logger(host)
+        return {
+            'logger': logger,
+            'retry_sleep_functions': self.retry_policy.sleep_functions(host, logger),
+        }
+    
+    def _rate_limit_progress(self, host):
+        """Get (observer, release) for a download holding a request slot of the host
+
+        The observer records a success with the retry policy once bytes
+        arrive, and frees the slot then: the request phase is over, so the
+        transfer no longer counts against a recovering host's allowance.
+        release frees the slot if no bytes came; either way it is freed once.
+        """
+        state = {'held': True}
+        lock = threading.Lock()
+        def release():
+            with lock:
+                held, state['held'] = state['held'], False
+            if held:
+                self.retry_policy.release(host)
+            return held
+        def on_progress(d):
+            if state['held'] and d.get('status') in ('downloading', 'finished') and release():
+                self.retry_policy.record_success(host)
+        return on_progress, release
+    
+    def _build_format_items(self, info, job=None):
+        """Index the formats of extracted info and build the format dropdown entries"""
+        format_index = FormatIndex(info)
+        
+        if job is not None:
+            # Playlist infos are not reused, their downloads go through extraction again
+            if _is_video_info(info):
+                job.info = info
+            job.format_index = format_index
+        
+        return format_index.items()
+    
+    
+    def download_video(self, url, output_path, format_choice, filename_template="%(title)s", info=None):
+        """Download YouTube video using yt-dlp with custom filename template
+        
+        If info from get_video_info is given, the download goes straight to
+        format selection and transfer instead of extracting the video again.
+        """
+        job = DownloadJob(url, output_path, format_choice, filename_template, self.progress_callback, info)
+        return self._with_postprocessing(job, self.download_job(job))
+    
+    def download_video_with_callback(self, url, output_path, format_choice, filename_template="%(title)s", progress_callback=None, info=None):
+        """Download YouTube video using yt-dlp with custom filename template and specific callback"""
+        job = DownloadJob(url, output_path, format_choice, filename_template, progress_callback, info)
+        return self._with_postprocessing(job, self.download_job(job))
+    
+    def _postprocess_callback(self, job):
+        """Build the post_process hook that hands a job's merges to the post-processing stage"""
+        def defer_merge(info):
+            plan = merge_plan(info)
+            if plan and self.postprocessing.available:
+                try:
+                    job.postprocessing.append(self.postprocessing.submit_merge(*plan))
+                except RuntimeError as e:
+                    # The parts stay on disk unmerged, as without the stage
+                    print(f"Could not queue merge: {e}")
+            return info
+        return defer_merge
+    
+    def wait_for_postprocessing(self, job, timeout=None):
+        """Wait for a job's merges to finish"""
+        errors = []
+        for future in job.postprocessing:
+            try:
+                future.result(timeout)
+            except Exception as e:
+                errors.append(str(e) or type(e).__name__)
+        if errors:
+            return False, f"Merging failed: {errors[0]}"
+        return True, "Post-processing completed."
+    
+    def _with_postprocessing(self, job, result):
+        """Wait for a job's merges before reporting its result, for callers that expect finished files"""
+        success, message = result
+        if success and job.postprocessing:
+            merged, merge_message = self.wait_for_postprocessing(job)
+            if not merged:
+                return False, merge_message
+        return success, message
+    
+    def ingest_urls(self, lines):
+        """Turn pasted or loaded lines into canonical URLs for new jobs
+        
+        Duplicates within the lines and items already queued or running are
+        dropped. Returns (urls, collapsed_count).
+        """
+        with self._jobs_lock:
+            inflight = [job.url for job in self.active_jobs]
+        # Queued jobs are not active yet, but the journal has them
+        inflight.extend(entry['url'] for entry in self.journal.unfinished())
+        seen = {canonicalize_url(url)[:2] for url in inflight}
+        return dedupe_urls(lines, seen)
+    
+    def journal_job(self, job):
+        """Record a queued job in the journal so it is resumed after a crash or restart"""
+        job.journal_key = self.journal.add(job)
+    
+    def resume_jobs(self):
+        """Rebuild the jobs the last run left unfinished
+        
+        Completed jobs are not in the journal any more. yt-dlp continues
+        each resumed download from its .part file, since the output name is
+        the same as before.
+        """
+        jobs = []
+        for entry in self.journal.unfinished():
+            job = DownloadJob(entry['url'], entry['output_path'], entry['format_choice'],
+                              entry['filename_template'], playlist=entry.get('playlist', False))
+            job.journal_key = entry['key']
+            job.part_file = entry.get('part_file')
+            jobs.append(job)
+        return jobs
+    
+    def cancel_job(self, job):
+        """Cancel a job on user request, it will not be resumed"""
+        job.cancel()
+        if job.journal_key:
+            self.journal.update(job.journal_key, phase='canceled')
+    
+    def fail_job(self, job):
+        """Journal a job that failed before its download ran, e.g. its extraction, so it is not resumed"""
+        self._journal_phase(job, 'failed')
+    
+    def _journal_progress(self, job):
+        """Build the progress observer that journals each new partial file"""
+        def record_part_file(d):
+            part_file = d.get('tmpfilename')
+            if part_file and part_file != job.part_file:
+                job.part_file = part_file
+                self.journal.update(job.journal_key, part_file=part_file)
+        return record_part_file
+    
+    def _start_job(self, job):
+        """Register a job as running"""
+        with self._jobs_lock:
+            self.active_jobs.add(job)
+        if job.journal_key:
+            self.journal.update(job.journal_key, phase='downloading')
+            job.add_observer(self._journal_progress(job))
+    
+    def _finish_job(self, job, success):
+        """Unregister a finished job, journal its outcome and archive its video"""
+        with self._jobs_lock:
+            self.active_jobs.discard(job)
+        
+        if job.cancelled:
+            self._journal_phase(job, 'canceled')
+        elif not success:
+            self._journal_phase(job, 'failed')
         else:
-            # User selected specific format from the list
-            for fmt in self.formats:
-                if fmt['str'] == format_choice:
-                    format_option = fmt['id']
-                    break
-            else:
-                format_option = "best"
+            if job.postprocessing:
+                self._journal_phase(job, 'postprocessing')
+            self._after_postprocessing(job, lambda ok: self._job_completed(job, ok))
+    
+    def _journal_phase(self, job, phase):
+        """Journal a job's new phase, if the job is journaled"""
+        if job.journal_key:
+            self.journal.update(job.journal_key, phase=phase)
+    
+    def _after_postprocessing(self, job, callback):
+        """Call callback(ok) once the job's merges are done, right away if it has none"""
+        futures = list(job.postprocessing)
+        if not futures:
+            callback(True)
+            return
+        
+        def merged(_):
+            # May run more than once if merges finish together; callbacks are idempotent
+            if all(future.done() for future in futures):
+                callback(not any(future.cancelled() or future.exception() for future in futures))
+        
+        for future in futures:
+            future.add_done_callback(merged)
+    
+    def _job_completed(self, job, ok):
+        """Record a job whose files are final"""
+        self._journal_phase(job, 'completed' if ok else 'failed')
+        if ok and not job.playlist:
+            video_id = extract_video_id(job.url) or (job.info or {}).get('id')
+            self.archive.add(job.output_path, video_id)
+    
+    def _start_tuning(self, job):
+        """Start the adaptive tuning sessions for a job"""
+        sessions = []
+        # A job that pins its own fragment concurrency is left alone
+        if 'concurrent_fragment_downloads' not in job.options:
+            sessions.append(self.fragment_controller.start_job(job))
+        if 'http_chunk_size' not in job.options:
+            sessions.append(self.chunk_tuner.start_job(job))
+        if 'ratelimit' not in job.options:
+            sessions.append(self.bandwidth.start_job(job))
+        for session in sessions:
+            job.add_observer(session.on_progress)
+        return sessions
+    
+    def _finish_tuning(self, job, sessions):
+        """Stop a job's tuning sessions"""
+        for session in sessions:
+            job.observers.remove(session.on_progress)
+            session.finish()
+    
+    def _job_overrides(self, job, sessions, overrides):
+        """Combine job options, tuned params and call-specific params for a checkout"""
+        combined = dict(job.options)
+        for session in sessions:
+            combined.update(session.overrides())
+        combined.update(overrides)
+        return combined
+    
+    def download_job(self, job):
+        """Download a single video described by a DownloadJob
         
+        Returns once the transfer is done; merges continue in job.postprocessing.
+        """
+        if job.info and job.format_index is None:
+            job.format_index = FormatIndex(job.info)
+        if job.estimated_size is None:
+            self.estimate_job_size(job)
+        
+        self._start_job(job)
+        sessions = self._start_tuning(job)
+        success = False
+        try:
+            success, message = self._check_disk_space(job)
+            if not success:
+                return success, message
+            success, message = self._download_job(job, sessions)
+            return success, message
+        finally:
+            self._finish_tuning(job, sessions)
+            self._finish_job(job, success)
+    
+    def estimate_job_size(self, job, probe=False):
+        """Estimate the bytes a job downloads from its extracted info, stored on the job
+        
+        With probe, streams without size metadata are sized with HEAD requests.
+        """
+        if job.format_index is None and job.info:
+            job.format_index = FormatIndex(job.info)
+        if job.format_index is not None:
+            job.estimated_size = job.format_index.estimate_size(job.format_choice, probe)[0]
+        return job.estimated_size
+    
+    def _check_disk_space(self, job):
+        """Make sure the job's estimated size fits in its output folder"""
+        if not job.estimated_size:
+            return True, "Size unknown"
+        
+        # A merge briefly needs room for the parts and the merged file
+        needed = job.estimated_size
+        if len(job.format_index.resolve(job.format_choice)) > 1:
+            needed *= 2
+        try:
+            free = shutil.disk_usage(job.output_path).free
+        except OSError:
+            # Folder not created yet, the download will report any real problem
+            return True, "Free space unknown"
+        
+        if needed > free:
+            return False, (f"Not enough disk space: about {needed / (1024 * 1024):.0f} MB needed, "
+                           f"{free / (1024 * 1024):.0f} MB free")
+        return True, "Enough disk space"
+    
+    def _download_job(self, job, sessions):
+        """Run the download attempts of a job, routing each failure by its error class"""
+        host = policy_host(job.url)
+        for attempt in range(self.MAX_RETRIES + 1):
+            # Waits here while the host is rate limited, and takes part in its gradual recovery
+            if not self.retry_policy.acquire(host, lambda: job.cancelled):
+                return False, "Download was canceled."
+            on_progress, release = self._rate_limit_progress(host)
+            job.add_observer(on_progress)
+            try:
+                return self._attempt_download(job, sessions, host)
+            except DownloadFailure as e:
+                failure = job.error = e
+            finally:
+                job.observers.remove(on_progress)
+                release()
+            
+            if isinstance(failure, RateLimited):
+                self.retry_policy.record_rate_limit(host)
+            if isinstance(failure, (RateLimited, Forbidden, FragmentMissing)):
+                for session in sessions:
+                    session.on_error()
+            
+            route = self.ERROR_ROUTES.get(type(failure), 'fail')
+            if job.cancelled:
+                return False, "Download was canceled."
+            elif route == 'fallback':
+                return self._try_alternative_download(job, sessions, host, failure)
+            elif route == 'retry' and attempt < self.MAX_RETRIES:
+                if isinstance(failure, TransientNetwork):
+                    # Rate limits wait in acquire, network errors get their own backoff
+                    job.wait_cancelled(self.retry_policy.backoff(attempt))
+                continue
+            return False, failure.describe("Download error")
+    
+    def _attempt_download(self, job, sessions, host):
+        """Run one download attempt, raising a DownloadFailure if yt-dlp fails"""
         # Set output template
-        outtmpl = os.path.join(output_path, f"{filename_template}.%(ext)s")
+        outtmpl = os.path.join(job.output_path, f"{job.filename_template}.%(ext)s")
         
-        # Enhanced options for version 2025.03.26
-        options = {
-            'format': format_option,
+        overrides = self._job_overrides(job, sessions, {
+            'format': self._get_format_option(job.format_choice, job.format_index),
             'outtmpl': outtmpl,
-            'cookiefile': self.cookies_file,
-            'progress_hooks': [self.progress_hook],
-            'quiet': True,
-            'no_warnings': False,
-            'ignoreerrors': True,
-            'no_color': True,
-            'geo_bypass': True,
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web', 'mobile'],
-                    'player_skip': [],
-                    'formats': 'missing_pot'  # Allow formats even if PO token is missing
-                }
-            },
-            'socket_timeout': 30,
-            'user_agent': self.get_random_user_agent(),
-            'http_chunk_size': 1048576,  # 1MB chunks
-            'youtube_include_dash_manifest': False,
-            'http_headers': {
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Origin': 'https://www.youtube.com',
-                'Referer': 'https://www.youtube.com/'
-            },
-            'retry_sleep_functions': {
-                'http': lambda x: 10 if x > 5 else 5,
-            },
-            'retries': 15,
-            'fragment_retries': 15,
-            'concurrent_fragment_downloads': 1,
-            'merge_output_format': 'mp4',
-            'allow_unplayable_formats': True  # New in recent yt-dlp versions
-        }
+            **self._rate_limit_overrides(host),
+        })
         
         try:
-            with yt_dlp.YoutubeDL(options) as ydl:
-                self.reset_cancel_flag()
-                ydl.download([url])
-                if not self.should_cancel:
+            with self.ydl_pool.checkout('download', overrides, job.progress_hook, self._postprocess_callback(job)) as ydl:
+                job.attach(ydl, overrides)
+                try:
+                    self._run_download(ydl, job)
+                finally:
+                    job.detach()
+                if not job.cancelled:
                     return True, "Download completed successfully."
                 else:
                     return False, "Download was canceled."
         except yt_dlp.utils.DownloadError as e:
-            error_message = str(e)
-            if "HTTP Error 429" in error_message:
-                return False, "YouTube rate limit exceeded. Please try again later."
-            elif "HTTP Error 403" in error_message:
-                # Try with different format after 403 error
-                return self._try_alternative_download(url, output_path, filename_template)
-            elif "fragment" in error_message and "not found" in error_message:
-                # Try with different HTTP chunk size
-                return self._try_alternative_download(url, output_path, filename_template, smaller_chunks=True)
-            elif "Precondition check failed" in error_message:
-                return False, "YouTube API error. This may be temporary, please try again later."
-            else:
-                return False, f"Download error: {error_message}"
+            raise classify(e)
         except Exception as e:
             return False, f"Error: {str(e)}"
     
-    def _try_alternative_download(self, url, output_path, filename_template="%(title)s", smaller_chunks=False):
-        """Try alternative download approach after a failure"""
+    def _run_download(self, ydl, job):
+        """Download a job with a checked-out instance, extracting only if the job has no info yet"""
+        if _is_video_info(job.info):
+            # Strip results of the earlier processing run (selected formats, filenames)
+            info = ydl.sanitize_info(job.info, remove_private_keys=True)
+            info.update(job.extra_info)
+            ydl.process_ie_result(info, download=True)
+            return
+        
+        # Extract and process separately so a fallback can reuse the extraction
+        info = ydl.extract_info(job.url, download=False, process=False)
+        if _is_video_info(info):
+            job.info = info
+        ydl.process_ie_result(info, download=True, extra_info=job.extra_info)
+    
+    def _try_alternative_download(self, job, sessions, host, failure):
+        """Try alternative download approach after a failure
+        
+        Reuses the job's extracted info. After missing fragments the same
+        format is fetched again with smaller chunks, continuing from its
+        partial file; otherwise the next viable format of the video is used.
+        """
+        if job.cancelled:
+            return False, "Download was canceled."
+        
         # Set output template
-        outtmpl = os.path.join(output_path, f"{filename_template}.%(ext)s")
+        outtmpl = os.path.join(job.output_path, f"{job.filename_template}.%(ext)s")
         
-        # Different options for a second attempt - optimized for 2025.03.26
-        options = {
-            'format': 'best[ext=mp4]/best',
-            'outtmpl': outtmpl,
-            'cookiefile': self.cookies_file,
-            'progress_hooks': [self.progress_hook],
-            'quiet': True,
-            'ignoreerrors': True,
-            'geo_bypass': True,
-            'user_agent': self.get_random_user_agent(),
-            'http_chunk_size': 262144 if smaller_chunks else 524288,  # Smaller chunks
-            'retries': 20,
-            'fragment_retries': 20,
-            'hls_prefer_native': True,
-            'concurrent_fragment_downloads': 1,
-            'allow_unplayable_formats': True,
-            'extractor_retries': 10,
-            'file_access_retries': 10
-        }
+        overrides = self._job_overrides(job, sessions, {'outtmpl': outtmpl, **self._rate_limit_overrides(host)})
+        # Smaller chunks than the tuned size, capped lower still after fragment errors
+        smaller_chunks = isinstance(failure, FragmentMissing)
+        chunk_cap = 262144 if smaller_chunks else 524288
+        overrides['http_chunk_size'] = min(overrides.get('http_chunk_size', chunk_cap), chunk_cap)
+        
+        # The pool rebuilds the instance's format selector from overrides['format'],
+        # otherwise the fallback profile's 'best[ext=mp4]/best' would be used
+        if _is_video_info(job.info):
+            if job.format_index is None:
+                job.format_index = FormatIndex(job.info)
+            if smaller_chunks:
+                # Same format and file name, so yt-dlp picks up the partial file
+                overrides['format'] = self._get_format_option(job.format_choice, job.format_index)
+            else:
+                fallback = job.format_index.fallback_for(job.format_choice)
+                if fallback is None:
+                    return False, failure.describe("Download error")
+                overrides['format'] = fallback['id']
         
         try:
-            with yt_dlp.YoutubeDL(options) as ydl:
-                self.reset_cancel_flag()
-                ydl.download([url])
-                if not self.should_cancel:
+            with self.ydl_pool.checkout('fallback', overrides, job.progress_hook, self._postprocess_callback(job)) as ydl:
+                job.attach(ydl, overrides)
+                try:
+                    self._run_download(ydl, job)
+                finally:
+                    job.detach()
+                if not job.cancelled:
                     return True, "Download completed successfully (using alternative method)."
                 else:
                     return False, "Download was canceled."
         except Exception as e:
-            return False, f"Alternative download method failed: {str(e)}"
+            failure = classify(e)
+            job.error = failure
+            if isinstance(failure, RateLimited):
+                self.retry_policy.record_rate_limit(host)
+            return False, f"Alternative download method failed: {failure.describe('Error')}"
     
-    def download_playlist(self, url, output_path, format_choice, filename_template="%(title)s"):
-        """Download YouTube playlist"""
-        # First, get playlist information
+    def download_playlist(self, url, output_path, format_choice, filename_template="%(title)s", progress_callback=None, job=None,
+                          priority=0):
+        """Download YouTube playlist
+        
+        Entries download in parallel as their own jobs, each with its own
+        tuning and fallback, queued with the given priority under the engine's
+        transfer limit. The playlist itself takes no transfer slot, so run it
+        with JobEngine.run_blocking. Merges of finished entries run in the
+        post-processing stage while the next entries download. Without a job,
+        this waits for them before returning.
+        """
+        if job is None:
+            job = DownloadJob(url, output_path, format_choice, filename_template,
+                              progress_callback or self.progress_callback, playlist=True)
+            result = self.download_playlist(url, output_path, format_choice, filename_template, job=job,
+                                            priority=priority)
+            return self._with_postprocessing(job, result)
+        self._start_job(job)
+        success = False
         try:
-            # Set options for playlist detection
-            info_options = {
-                'quiet': True,
-                'no_warnings': False,
-                'extract_flat': True,
-                'playlist_items': '1-999',  # Limit to reasonable number
-                'cookiefile': self.cookies_file,
-                'user_agent': self.get_random_user_agent(),
-            }
-            
-            with yt_dlp.YoutubeDL(info_options) as ydl:
-                info_result = ydl.extract_info(url, download=False)
+            success, message = self._download_playlist(url, output_path, format_choice, filename_template, job,
+                                                       priority)
+            return success, message
+        finally:
+            self._finish_job(job, success)
+    
+    def _download_playlist(self, url, output_path, format_choice, filename_template, job, priority=0):
+        """Run the download of a playlist job
+        
+        Entries are enumerated page by page and queued as each page arrives,
+        so downloads start before enumeration ends and memory use does not
+        grow with the length of the playlist.
+        """
+        progress = PlaylistProgress(job)
+        enumeration_error = None
+        try:
+            # The entry generator fetches pages through this instance, keep it until enumeration ends
+            with self.ydl_pool.checkout('playlist_info', self._rate_limit_overrides(policy_host(url))) as ydl:
+                info_result = self._resolve_playlist(ydl, url)
                 
                 if not info_result:
                     return False, "Unable to retrieve playlist information."
@@ -332,53 +776,119 @@ class YouTubeDownloader:
                 if not os.path.exists(playlist_folder):
                     os.makedirs(playlist_folder)
                 
-                # Include playlist info in the template
-                download_template = f"{filename_template}"
-                
-                # Add index number to avoid filename conflicts
-                outtmpl = os.path.join(playlist_folder, f"%(playlist_index)s-{download_template}.%(ext)s")
+                # At most playlist_concurrency entries are queued or running, so pages are
+                # fetched as downloads need them; the engine's transfer limit decides how many run
+                queue_slots = threading.BoundedSemaphore(self.playlist_concurrency)
+                pending = set()
+                pending_lock = threading.Lock()
                 
-                # Setup options for downloading
-                download_options = {
-                    'format': self._get_format_option(format_choice),
-                    'outtmpl': outtmpl,
-                    'cookiefile': self.cookies_file,
-                    'progress_hooks': [self.progress_hook],
-                    'quiet': True,
-                    'no_warnings': False,
-                    'ignoreerrors': True,
-                    'no_color': True,
-                    'geo_bypass': True,
-                    'socket_timeout': 30,
-                    'user_agent': self.get_random_user_agent(),
-                    'http_chunk_size': 1048576,
-                    'retries': 15,
-                    'fragment_retries': 15,
-                    'allow_unplayable_formats': True,
-                    'extractor_args': {
-                        'youtube': {
-                            'player_client': ['android', 'web', 'mobile'],
-                            'player_skip': [],
-                            'formats': 'missing_pot'  # Allow formats even if PO token is missing
-                        }
-                    }
-                }
+                def entry_finished(future):
+                    """Free the entry's queue slot (runs on the engine's loop thread)"""
+                    with pending_lock:
+                        pending.discard(future)
+                    queue_slots.release()
                 
-                self.reset_cancel_flag()
-                
-                # Download playlist
-                with yt_dlp.YoutubeDL(download_options) as ydl:
-                    ydl.download([url])
-                    
-                    if self.should_cancel:
-                        return False, "Playlist download was canceled."
-                    else:
-                        return True, f"Playlist '{playlist_title}' downloaded successfully."
-                        
+                try:
+                    for index, entry in enumerate(info_result['entries'], 1):
+                        if job.cancelled:
+                            break
+                        if not entry:
+                            continue
+                        # Checked before any per-video extraction, so a re-sync only touches new uploads
+                        video_id = entry.get('id') or extract_video_id(entry.get('url') or '')
+                        if self.archive.contains(playlist_folder, video_id):
+                            progress.entry_skipped(index)
+                            continue
+                        queue_slots.acquire()
+                        progress.add_entry()
+                        entry_args = (job, info_result, index, entry, playlist_folder, filename_template, progress)
+                        if self.engine is None:
+                            # No engine (e.g. a script), download the entries one after another
+                            queue_slots.release()
+                            self._download_playlist_entry(*entry_args)
+                            continue
+                        future = self.engine.submit_transfer(self._download_playlist_entry, *entry_args,
+                                                             priority=priority)
+                        with pending_lock:
+                            pending.add(future)
+                        future.add_done_callback(entry_finished)
+                except Exception as e:
+                    # Keep the entries already queued, report the rest as lost
+                    enumeration_error = str(e)
+                finally:
+                    progress.enumeration_done()
+                    # Queued entries of a canceled playlist return as soon as they start
+                    while True:
+                        with pending_lock:
+                            waiting = list(pending)
+                        if not waiting:
+                            break
+                        wait_futures(waiting, timeout=0.5)
         except yt_dlp.utils.DownloadError as e:
-            return False, f"Playlist download error: {str(e)}"
+            failure = classify(e)
+            job.error = failure
+            if isinstance(failure, RateLimited):
+                self.retry_policy.record_rate_limit(policy_host(url))
+            return False, failure.describe("Playlist download error")
         except Exception as e:
             return False, f"Error downloading playlist: {str(e)}"
+        
+        if job.cancelled:
+            return False, "Playlist download was canceled."
+        elif progress.count == 0:
+            return False, f"Playlist download error: {enumeration_error}" if enumeration_error else "The playlist has no downloadable entries."
+        elif progress.failed == progress.count:
+            return False, f"Playlist download failed: {progress.first_error}"
+        elif not progress.failed and not enumeration_error and not progress.skipped:
+            return True, f"Playlist '{playlist_title}' downloaded successfully."
+        
+        message = f"Playlist '{playlist_title}' downloaded"
+        if progress.skipped:
+            message += f", {progress.skipped} already in the archive"
+        if progress.failed:
+            message += f", {progress.failed} of {progress.count} entries failed"
+        if enumeration_error:
+            message += f", listing stopped after {progress.count} entries: {enumeration_error}"
+        return True, message + "."
+    
+    def _resolve_playlist(self, ydl, url):
+        """Extract a playlist without processing it, so its entries stay a lazy page generator"""
+        info = ydl.extract_info(url, download=False, process=False)
+        # Follow redirects, e.g. a watch URL with a list parameter points at its playlist
+        for _ in range(5):
+            if not info or info.get('_type') not in ('url', 'url_transparent'):
+                break
+            info = ydl.extract_info(info['url'], download=False, process=False, ie_key=info.get('ie_key'))
+        return info
+    
+    def _download_playlist_entry(self, job, playlist_info, index, entry, playlist_folder, filename_template, progress):
+        """Download one playlist entry as its own job"""
+        if job.cancelled:
+            progress.entry_done(index, False, "Download was canceled.")
+            return
+        
+        entry_url = entry.get('url') or entry.get('webpage_url') or entry.get('id')
+        playlist_count = playlist_info.get('playlist_count')
+        # Same fields yt-dlp gives playlist entries, so %(playlist_index)s keeps its zero padding.
+        # The length is unknown until enumeration ends, so pad as for 999 entries unless the site said.
+        extra_info = {
+            'playlist': playlist_info.get('title') or playlist_info.get('id'),
+            'playlist_id': playlist_info.get('id'),
+            'playlist_title': playlist_info.get('title'),
+            'playlist_count': playlist_count,
+            'playlist_index': index,
+            '__last_playlist_index': playlist_count or 999,
+        }
+        # Entries share the playlist's cancel token and split its bandwidth weight
+        entry_job = DownloadJob(entry_url, playlist_folder, job.format_choice,
+                                f"%(playlist_index)s-{filename_template}",
+                                progress.callback(index), options=job.options,
+                                weight=job.weight / self.playlist_concurrency,
+                                extra_info=extra_info, parent=job)
+        
+        success, message = self.download_job(entry_job)
+        job.postprocessing.extend(entry_job.postprocessing)
+        progress.entry_done(index, success, message)
     
     def _sanitize_filename(self, name):
         """Remove invalid characters from filename"""
@@ -387,7 +897,7 @@ class YouTubeDownloader:
             name = name.replace(char, '_')
         return name
     
-    def _get_format_option(self, format_choice):
+    def _get_format_option(self, format_choice, format_index=None):
         """Get format option string based on user selection"""
         if format_choice == "audio only":
             return "bestaudio[ext=m4a]/bestaudio/best"
@@ -397,38 +907,10 @@ class YouTubeDownloader:
             height = format_choice[:-1]
             return f"bestvideo[height<={height}][ext=mp4]+bestaudio[ext=m4a]/best[height<={height}][ext=mp4]/best"
         else:
-            # User selected specific format from the list
-            for fmt in self.formats:
-                if fmt['str'] == format_choice:
-                    return fmt['id']
-            return "best"
-    
-    def progress_hook(self, d):
-        """Handle progress updates from yt-dlp"""
-        if self.should_cancel:
-            raise Exception("Download canceled by user")
-        
-        if self.progress_callback:
-            self.progress_callback(d)
-    
-    def download_video_with_callback(self, url, output_path, format_choice, filename_template="%(title)s", progress_callback=None):
-        """Download YouTube video using yt-dlp with custom filename template and specific callback"""
-        # Store current callback
-        original_callback = self.progress_callback
-        
-        # Set temporary callback
-        if progress_callback:
-            self.progress_callback = progress_callback
-        
-        try:
-            # Use the normal download method
-            result = self.download_video(url, output_path, format_choice, filename_template)
-            
-            # Restore original callback
-            self.progress_callback = original_callback
-            
-            return result
-        except Exception as e:
-            # Restore original callback in case of error
-            self.progress_callback = original_callback
-            return False, f"Error: {str(e)}"
+            # User selected specific format from the list, entries start with the format ID
+            if format_index is not None:
+                fmt = format_index.lookup(format_choice)
+                return fmt['id'] if fmt else "best"
+            # No extraction to check against (e.g. a resumed job), let yt-dlp fall back
+            format_id = format_choice.split(' - ', 1)[0].strip()
+            return f"{format_id}/best" if format_id else "best"
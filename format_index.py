@@ -0,0 +1,213 @@
+import requests
+from concurrent.futures import ThreadPoolExecutor
+
+# Quality presets offered above the per-format entries in the format dropdowns
+PRESETS = ["best", "1080p", "720p", "480p", "360p", "audio only"]
+
+
+class FormatIndex:
+    """Formats of one extraction, indexed for selection and size estimates
+
+    Built once per extraction. Formats are keyed by format ID, height
+    and extension, and the formats each preset resolves to are
+    worked out up front, picking the same way yt-dlp's best* selectors do:
+    the last match in info['formats'], which yt-dlp sorts worst to best.
+    """
+
+    def __init__(self, info):
+        self.duration = info.get('duration')
+        # Every format in yt-dlp's order; entries are dicts like the old format list
+        self.formats = []
+        # Formats shown in the dropdown after the presets
+        self.selectable = []
+        self.by_id = {}
+        self.by_height = {}
+        self.by_ext = {}
+        # 'video' (video only), 'audio' (audio only), 'combined' -> positions
+        self.by_kind = {'video': set(), 'audio': set(), 'combined': set()}
+
+        for position, f in enumerate(info.get('formats') or []):
+            entry = self._entry(position, f)
+            self.formats.append(entry)
+            self.by_id[entry['id']] = entry
+            self.by_height.setdefault(entry['height'], set()).add(position)
+            self.by_ext.setdefault(entry['ext'], set()).add(position)
+            kind = self._kind(entry)
+            if kind:
+                self.by_kind[kind].add(position)
+            if entry['note'] or entry['resolution'] != 'N/A':
+                self.selectable.append(entry)
+
+        # preset -> entries it downloads (one, or a video + audio pair)
+        self.presets = {preset: self._match_preset(preset) for preset in PRESETS}
+
+    def _entry(self, position, f):
+        """Build the compact index entry of a yt-dlp format"""
+        format_id = f.get('format_id', '')
+        extension = f.get('ext', '')
+        resolution = f.get('resolution', 'N/A')
+        note = f.get('format_note', '')
+        return {
+            'id': format_id,
+            'ext': extension,
+            'resolution': resolution,
+            'note': note,
+            'str': f"{format_id} - {extension} - {resolution} - {note}",
+            'position': position,
+            'height': f.get('height'),
+            'has_video': f.get('vcodec') != 'none',
+            'has_audio': f.get('acodec') != 'none',
+            'filesize': f.get('filesize'),
+            'filesize_approx': f.get('filesize_approx'),
+            'tbr': f.get('tbr'),
+            'url': f.get('url'),
+            'protocol': f.get('protocol', ''),
+            'http_headers': f.get('http_headers') or {},
+        }
+
+    def _kind(self, entry):
+        """Classify a format the way yt-dlp's bestvideo/bestaudio/best see it"""
+        if entry['has_video'] and entry['has_audio']:
+            return 'combined'
+        if entry['has_video']:
+            return 'video'
+        if entry['has_audio']:
+            return 'audio'
+        return None
+
+    def best(self, kind, max_height=None, ext=None, exclude=()):
+        """Get the best format of a kind within the limits, or None"""
+        positions = self.by_kind[kind] - set(exclude)
+        if ext is not None:
+            positions = positions & self.by_ext.get(ext, set())
+        if max_height is not None:
+            # Like yt-dlp's [height<=N], formats without a height do not match
+            allowed = set()
+            for height, at_height in self.by_height.items():
+                if height is not None and height <= max_height:
+                    allowed |= at_height
+            positions = positions & allowed
+        return self.formats[max(positions)] if positions else None
+
+    def _match_preset(self, preset):
+        """Work out the formats a preset's format spec selects"""
+        if preset == "audio only":
+            # bestaudio[ext=m4a]/bestaudio/best
+            audio = self.best('audio', ext='m4a') or self.best('audio') or self.best('combined')
+            return [audio] if audio else []
+
+        # bestvideo[height<=N][ext=mp4]+bestaudio[ext=m4a]/best[height<=N][ext=mp4]/best
+        height = None if preset == "best" else int(preset[:-1])
+        video = self.best('video', height, 'mp4')
+        audio = self.best('audio', ext='m4a')
+        if video and audio:
+            return [video, audio]
+        combined = self.best('combined', height, 'mp4') or self.best('combined')
+        return [combined] if combined else []
+
+    def fallback_for(self, choice):
+        """Get the next viable format once the formats of a choice failed, or None
+
+        A single file with both streams (mp4 first), no taller than what was
+        chosen, so the fallback needs neither a merge nor the failed streams.
+        For audio only, the next best audio stream.
+        """
+        failed = self.resolve(choice)
+        exclude = [entry['position'] for entry in failed]
+        if choice == "audio only":
+            return self.best('audio', exclude=exclude) or self.best('combined', exclude=exclude)
+        if choice in self.presets:
+            max_height = None if choice == "best" else int(choice[:-1])
+        else:
+            max_height = max((entry['height'] for entry in failed if entry['height']), default=None)
+        return (self.best('combined', max_height, 'mp4', exclude)
+                or self.best('combined', max_height, exclude=exclude)
+                or self.best('combined', exclude=exclude))
+
+    def items(self):
+        """Get the dropdown entries: presets, then the selectable formats"""
+        return PRESETS + [entry['str'] for entry in self.selectable]
+
+    def lookup(self, choice):
+        """Get the format entry for a dropdown entry or a bare format ID, or None"""
+        if not choice:
+            return None
+        # Dropdown entries start with the format ID
+        return self.by_id.get(choice.split(' - ', 1)[0].strip())
+
+    def resolve(self, choice):
+        """Get the formats a choice downloads: a preset's match, or the one chosen format"""
+        if choice in self.presets:
+            return self.presets[choice]
+        entry = self.lookup(choice)
+        return [entry] if entry else []
+
+    def format_size(self, entry):
+        """Get (bytes, exact) for one format, or (None, False) if nothing is known
+
+        Uses the reported size, then yt-dlp's approximation, then the total
+        bitrate over the duration.
+        """
+        if entry['filesize']:
+            return entry['filesize'], True
+        if entry['filesize_approx']:
+            return entry['filesize_approx'], False
+        if entry['tbr'] and self.duration:
+            # tbr is in kbit/s
+            return int(entry['tbr'] * 1000 / 8 * self.duration), False
+        return None, False
+
+    def estimate_size(self, choice, probe=False):
+        """Get (bytes, exact) of what a choice downloads, video and audio summed
+
+        Returns (None, False) if the size of any part is unknown. With probe,
+        parts without size metadata are asked for their Content-Length.
+        """
+        entries = self.resolve(choice)
+        if not entries:
+            return None, False
+
+        if probe:
+            probe_sizes([entry for entry in entries if self.format_size(entry)[0] is None])
+
+        total = 0
+        exact = True
+        for entry in entries:
+            size, size_exact = self.format_size(entry)
+            if size is None:
+                return None, False
+            total += size
+            exact = exact and size_exact
+        return total, exact
+
+
+def _probe_size(entry, timeout):
+    """Get a stream's Content-Length with a HEAD request, or None"""
+    try:
+        response = requests.head(entry['url'], headers=entry['http_headers'],
+                                 timeout=timeout, allow_redirects=True)
+        if response.ok:
+            length = int(response.headers.get('Content-Length', 0))
+            return length or None
+    except (requests.RequestException, ValueError) as e:
+        print(f"Error probing format {entry['id']}: {e}")
+    return None
+
+
+def probe_sizes(entries, max_workers=4, timeout=10):
+    """Fill in the sizes of formats from HEAD requests, all probed at the same time
+
+    Only plain HTTP(S) streams can be probed; fragmented (DASH/HLS) manifests
+    do not report the size of the media.
+    """
+    entries = [entry for entry in entries
+               if entry['url'] and entry['protocol'] in ('http', 'https', '')]
+    if not entries:
+        return
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(entries))) as executor:
+        sizes = list(executor.map(lambda entry: _probe_size(entry, timeout), entries))
+    for entry, size in zip(entries, sizes):
+        if size:
+            # Content-Length is the exact size of the stream
+            entry['filesize'] = size
@@ -0,0 +1,149 @@
+import threading
+
+
+class FragmentConcurrencyController:
+    """Adapts concurrent_fragment_downloads from observed throughput and errors
+
+    yt-dlp reads the fragment concurrency when a DASH/HLS stream starts, so a
+    new level takes effect at the next stream of the job (e.g. the audio stream
+    after the video stream) and is remembered as the starting level for later jobs.
+    """
+
+    def __init__(self, per_job_limit=4, global_limit=8):
+        # Most fragment threads a single job may use
+        self.per_job_limit = per_job_limit
+        # Most fragment threads across all running jobs
+        self.global_limit = global_limit
+        # Starting level for new jobs, learned from recent jobs
+        self.start_level = 1
+        self._allocated = {}
+        self._lock = threading.Lock()
+
+    def configure(self, per_job_limit=None, global_limit=None):
+        """Update concurrency limits"""
+        with self._lock:
+            if per_job_limit is not None:
+                self.per_job_limit = max(1, per_job_limit)
+            if global_limit is not None:
+                self.global_limit = max(1, global_limit)
+            self.start_level = min(self.start_level, self.per_job_limit)
+
+    def _grant(self, job_id, wanted):
+        """Reserve up to `wanted` fragment threads for a job within the global ceiling"""
+        others = sum(level for other_id, level in self._allocated.items() if other_id != job_id)
+        granted = max(1, min(wanted, self.per_job_limit, self.global_limit - others))
+        self._allocated[job_id] = granted
+        return granted
+
+    def start_job(self, job):
+        """Create the tuning session for a job"""
+        with self._lock:
+            level = self._grant(job.job_id, self.start_level)
+        return FragmentTuning(self, job, level)
+
+    def finish_job(self, session):
+        """Release a job's threads and remember how well it did"""
+        with self._lock:
+            self._allocated.pop(session.job.job_id, None)
+            if session.error_count:
+                self.start_level = max(1, min(self.start_level, session.level))
+            elif session.best_level:
+                # Carry on ramping from where the job left off, unless it found its peak
+                level = session.best_level if session.holding else session.level
+                self.start_level = min(level, self.per_job_limit)
+
+    def adjust(self, session, wanted):
+        """Move a job to a new level, limited by the global ceiling"""
+        with self._lock:
+            return self._grant(session.job.job_id, wanted)
+
+    def stats(self):
+        """Get current allocation"""
+        with self._lock:
+            return {
+                'start_level': self.start_level,
+                'allocated': sum(self._allocated.values()),
+                'global_limit': self.global_limit,
+            }
+
+
+class FragmentTuning:
+    """Per-job fragment concurrency state, fed by the job's progress hook"""
+
+    # Relative throughput gain needed to keep ramping up
+    RAMP_THRESHOLD = 1.1
+
+    def __init__(self, controller, job, level):
+        self.controller = controller
+        self.job = job
+        self.level = level
+        self.best_level = None
+        self.error_count = 0
+        # level -> best throughput (bytes/s) seen at that level
+        self._throughput = {}
+        self.holding = False
+        # Output names of the fragmented streams still downloading
+        self._fragmented = set()
+
+    def overrides(self):
+        """yt-dlp params this session controls"""
+        return {'concurrent_fragment_downloads': self.level}
+
+    def finish(self):
+        """Release the job's fragment threads"""
+        self.controller.finish_job(self)
+
+    def on_progress(self, d):
+        """Measure throughput of each finished fragmented stream
+
+        yt-dlp only sends fragment_count/fragment_index while a stream is
+        downloading, so streams are marked as fragmented then and measured
+        on their 'finished' event, which carries the same filename.
+        """
+        stream = d.get('filename') or d.get('tmpfilename')
+        if d.get('status') == 'downloading':
+            if stream and (d.get('fragment_count') or d.get('fragment_index') is not None):
+                self._fragmented.add(stream)
+            return
+        if d.get('status') != 'finished' or stream not in self._fragmented:
+            return
+        self._fragmented.discard(stream)
+
+        elapsed = d.get('elapsed')
+        total = d.get('total_bytes') or d.get('downloaded_bytes')
+        if not elapsed or not total:
+            return
+
+        throughput = total / elapsed
+        self._throughput[self.level] = max(throughput, self._throughput.get(self.level, 0))
+        self._evaluate()
+
+    def _evaluate(self):
+        """Ramp up while throughput keeps improving, otherwise settle on the best level"""
+        best_level = max(self._throughput, key=self._throughput.get)
+        self.best_level = best_level
+
+        if best_level < self.level:
+            # More parallelism did not help, go back and stay there
+            self.holding = True
+            self._set_level(best_level)
+            return
+
+        lower = [level for level in self._throughput if level < self.level]
+        improved = not lower or self._throughput[self.level] >= self._throughput[max(lower)] * self.RAMP_THRESHOLD
+        if not improved:
+            # Gains have flattened out, keep the current level
+            self.holding = True
+        elif not self.holding:
+            self._set_level(self.level * 2)
+
+    def on_error(self):
+        """Back off after rate limiting, 403s or fragment errors"""
+        self.error_count += 1
+        self.holding = True
+        self._set_level(max(1, self.level // 2))
+
+    def _set_level(self, wanted):
+        """Apply a new level to the running download"""
+        self.level = self.controller.adjust(self, wanted)
+        self.job.set_param('concurrent_fragment_downloads', self.level)
@@ -1,12 +1,21 @@
 import os
-import threading
-import time
+import asyncio
 import dearpygui.dearpygui as dpg
 from datetime import datetime
 import webbrowser
 import shutil
+from download_job import DownloadJob
+from job_engine import JobEngine
+from url_utils import dedupe_urls
+from progress_bus import ProgressBus
+from ui_queue import UICommandQueue
+from history_view import HistoryView
+from history_store import HistoryStore, PERIODS
 
 class YouTubeDownloaderGUI:
+    # Seconds per frame spent running queued UI commands, the rest is left for rendering
+    FRAME_BUDGET = 0.008
+    
     def __init__(self, downloader):
         # Store downloader instance
         self.downloader = downloader
@@ -20,25 +29,64 @@ class YouTubeDownloaderGUI:
         # Application variables
         self.download_path = os.path.expanduser("~/Downloads")
         self.is_downloading = False
-        self.download_history = []
+        # GUI calls from worker threads, run by the render loop
+        self.ui = UICommandQueue()
+        # Download History, kept on disk and shown a window at a time
+        self.history_store = HistoryStore()
+        self.history_view = HistoryView(self.history_store, self.ui.post, "history_table", "history_scroll",
+                                        count_label="history_count", open_callback=self.open_file)
+        self.current_history_entry = None  # History entry of the Downloader tab's download
         self.download_speed = "0 KB/s"
         self.estimated_time = "Unknown"
-        self.last_downloaded_bytes = 0
-        self.last_time = time.time()
+        self.current_info = None  # Info extracted by "Get Info", reused by "Download"
+        self.current_info_url = None
+        self.current_format_index = None  # FormatIndex of current_info
+        self.current_job = None  # Job started from the Downloader tab
+        self.batch_jobs = []  # Jobs started from the Batch Download tab
         self.info_output_path = self.download_path  # New variable for info output path
         self.is_gathering_info = False  # New state variable for info gathering
+        self.gather_slots = None  # Limiter of the running info gathering, resized by its slider
         self.settings = {
             "theme": "dark",
             "autoplay_preview": False,
             "filename_template": "%(title)s",
-            "downloads_folder": self.download_path
+            "downloads_folder": self.download_path,
+            "cache_memory_ttl": 1800,
+            "cache_disk_ttl": 10800,
+            "cache_max_memory_entries": 256,
+            "cache_max_disk_entries": 5000,
+            "max_concurrent_downloads": 2,
+            "max_concurrent_extractions": 4,
+            "info_gather_concurrency": 8,
+            "playlist_concurrency": 3,
+            "fragment_concurrency": 4,
+            "max_fragment_concurrency": 8,
+            "bandwidth_limit": "0",
+            "bandwidth_schedule": "",
+            "download_archive": "folder"
         }
         
         # Load settings if available
         self.load_settings()
+        self.downloader.configure(self.settings)
+        
+        # Event loop that runs every background job of the GUI
+        self.engine = JobEngine()
+        self.downloader.set_engine(self.engine)
+        self.configure_engine()
         
         # Create GUI
         self.create_gui()
+        self.update_history_table()
+        
+        # Show when a host is rate limited and every download to it is paused
+        self.downloader.retry_policy.listeners.append(self.on_rate_limit_change)
+        
+        # Progress hooks only post events, the render loop updates the widgets at a fixed rate
+        self.progress_bus = ProgressBus()
+        
+        # Pick up downloads the last run did not finish
+        self.resume_unfinished_jobs()
     
     def save_settings(self):
         """Save user settings to file"""
@@ -75,6 +123,16 @@ class YouTubeDownloaderGUI:
         except Exception as e:
             print(f"Error loading settings: {e}")
     
+    def configure_engine(self):
+        """Apply concurrency settings to the job engine"""
+        try:
+            self.engine.set_limits(
+                max_extractions=int(self.settings.get("max_concurrent_extractions", 4)),
+                max_transfers=int(self.settings.get("max_concurrent_downloads", 2)),
+            )
+        except (TypeError, ValueError) as e:
+            print(f"Invalid concurrency settings: {e}")
+    
     def create_gui(self):
         # Create viewport
         dpg.create_viewport(title="YouTube Downloader", width=900, height=700)
@@ -113,6 +171,7 @@ class YouTubeDownloaderGUI:
         # Create context menu for download history
         with dpg.handler_registry():
             dpg.add_key_press_handler(dpg.mvKey_Delete, callback=self.delete_selected_history)
+            dpg.add_mouse_wheel_handler(callback=self.on_history_wheel)
 
     def create_downloader_tab(self):
         """Create the main downloader interface"""
@@ -145,7 +204,8 @@ class YouTubeDownloaderGUI:
                             items=["best", "1080p", "720p", "480p", "360p", "audio only"],
                             default_value="best",
                             tag="format_combo",
-                            width=300
+                            width=300,
+                            callback=self.on_format_change
                         )
                 
                 # Estimated download size
@@ -167,6 +227,7 @@ class YouTubeDownloaderGUI:
             with dpg.group():
                 dpg.add_text("Status: Ready", tag="status")
                 dpg.add_text("", tag="error_message", color=[255, 100, 100], wrap=850)
+                dpg.add_text("", tag="rate_limit_status", color=[255, 180, 80], wrap=850)
                 
                 with dpg.group(horizontal=True):
                     dpg.add_text("Progress: ", tag="progress_text")
@@ -227,6 +288,7 @@ class YouTubeDownloaderGUI:
             # Progress information
             dpg.add_text("Status: Ready", tag="batch_status")
             dpg.add_text("", tag="batch_error_message", color=[255, 100, 100], wrap=850)
+            dpg.add_text("", tag="batch_rate_limit_status", color=[255, 180, 80], wrap=850)
             
             # Overall progress
             with dpg.group():
@@ -305,16 +367,34 @@ class YouTubeDownloaderGUI:
                 dpg.add_button(label="Clear History", callback=self.clear_history, width=120)
                 dpg.add_button(label="Refresh", callback=self.refresh_history, width=100)
             
-            # History table
-            with dpg.table(tag="history_table", header_row=True, policy=dpg.mvTable_SizingStretchProp,
-                          borders_innerH=True, borders_outerH=True, borders_innerV=True,
-                          borders_outerV=True, resizable=True, sortable=True, width=850, height=400):
-                dpg.add_table_column(label="Date/Time")
-                dpg.add_table_column(label="Title")
-                dpg.add_table_column(label="Format")
-                dpg.add_table_column(label="Status")
-                dpg.add_table_column(label="File")
-                dpg.add_table_column(label="Action")
+            # Filters, run as indexed queries on the history store
+            with dpg.group(horizontal=True):
+                dpg.add_combo(("All", "Complete", "Failed", "Canceled", "Interrupted", "Downloading"),
+                              default_value="All", tag="history_status_filter", width=120,
+                              callback=self.on_history_filter_change)
+                dpg.add_combo(tuple(PERIODS), default_value="All time", tag="history_period_filter", width=120,
+                              callback=self.on_history_filter_change)
+                dpg.add_input_text(hint="Search title, video ID or format", tag="history_search", width=300,
+                                   on_enter=True, callback=self.on_history_filter_change)
+                dpg.add_text("", tag="history_count")
+            
+            # History table, a fixed set of rows showing a window of the entries
+            with dpg.group(horizontal=True):
+                with dpg.table(tag="history_table", header_row=True, policy=dpg.mvTable_SizingStretchProp,
+                              borders_innerH=True, borders_outerH=True, borders_innerV=True,
+                              borders_outerV=True, resizable=True, width=850):
+                    dpg.add_table_column(label="Date/Time")
+                    dpg.add_table_column(label="Title")
+                    dpg.add_table_column(label="Format")
+                    dpg.add_table_column(label="Status")
+                    dpg.add_table_column(label="File")
+                    dpg.add_table_column(label="Action")
+                    self.history_view.build()
+                
+                # Scrolls the window, the table itself never holds more rows
+                dpg.add_slider_int(tag="history_scroll", vertical=True, height=400, width=20,
+                                   min_value=0, max_value=0, enabled=False,
+                                   callback=lambda s, a: self.history_view.scroll_to(a))
 
     def create_settings_tab(self):
         """Create settings interface"""
@@ -344,6 +424,27 @@ class YouTubeDownloaderGUI:
                     with dpg.tooltip("filename_help"):    
                         dpg.add_text("Available variables:\n%(title)s - Video title\n%(id)s - Video ID\n%(uploader)s - Uploader\n%(upload_date)s - Upload date")
                 
+                # Bandwidth limits
+                with dpg.group(horizontal=True):
+                    dpg.add_text("Bandwidth Limit:")
+                    dpg.add_input_text(default_value=str(self.settings["bandwidth_limit"]), tag="bandwidth_limit", width=100)
+                    dpg.add_text("Schedule:")
+                    dpg.add_input_text(default_value=str(self.settings["bandwidth_schedule"]), tag="bandwidth_schedule", width=300)
+                    dpg.add_text(" ?", tag="bandwidth_help")
+                    
+                    with dpg.tooltip("bandwidth_help"):
+                        dpg.add_text("Limit shared by all downloads, e.g. 500K or 2M (0 = unlimited)\nSchedule overrides it by time of day, e.g. 08:00-18:00=1M; 23:00-07:00=0")
+                
+                # Download archive
+                with dpg.group(horizontal=True):
+                    dpg.add_text("Download Archive:")
+                    dpg.add_combo(("folder", "global", "off"), default_value=self.settings["download_archive"],
+                                  tag="download_archive", width=100)
+                    dpg.add_text(" ?", tag="archive_help")
+                    
+                    with dpg.tooltip("archive_help"):
+                        dpg.add_text("Playlist entries already downloaded are skipped\nfolder - per output folder, global - anywhere, off - always download")
+                
                 # Save settings button
                 dpg.add_button(label="Save Settings", callback=self.save_user_settings, width=120)
 
@@ -432,12 +533,21 @@ class YouTubeDownloaderGUI:
         dpg.set_value("video_upload_date", "Upload Date: Loading...")
         dpg.set_value("error_message", "")
         dpg.set_value("progress", 0)
+        # Read on the GUI thread, workers only post UI commands
+        format_choice = dpg.get_value("format_combo")
         
-        # Get video info in a separate thread
-        def get_info_thread():
-            success, result, formats = self.downloader.get_video_info(url)
+        # Get video info on the job engine
+        async def get_info_task():
+            # The job only collects the info and its format index
+            info_job = DownloadJob(url, self.download_path)
+            success, result, formats = await self.engine.extract(self.downloader.get_video_info, url, job=info_job)
             
             if success:
+                # Keep the extracted info so the download can skip a second extraction
+                self.current_info = result
+                self.current_info_url = url
+                self.current_format_index = info_job.format_index
+                
                 # Set video information
                 title = result.get('title', 'Unknown')
                 uploader = result.get('uploader', 'Unknown')
@@ -467,55 +577,64 @@ class YouTubeDownloaderGUI:
                 if is_playlist:
                     entries = result.get('entries', [])
                     playlist_count = len(list(entries)) if entries else 0
-                    dpg.configure_item("playlist_options", show=True)
-                    dpg.set_value("playlist_count", f"Videos found: {playlist_count}")
-                    dpg.configure_item("select_playlist_items", show=playlist_count > 0)
+                    self.ui.configure_item("playlist_options", show=True)
+                    self.ui.set_value("playlist_count", f"Videos found: {playlist_count}")
+                    self.ui.configure_item("select_playlist_items", show=playlist_count > 0)
                 else:
-                    dpg.configure_item("playlist_options", show=False)
+                    self.ui.configure_item("playlist_options", show=False)
                 
                 # Update UI with video details
-                dpg.set_value("video_title", f"Title: {title}")
-                dpg.set_value("video_duration", f"Duration: {duration_str}")
-                dpg.set_value("video_channel", f"Channel: {uploader}")
-                dpg.set_value("video_upload_date", f"Upload Date: {upload_date}")
+                self.ui.set_value("video_title", f"Title: {title}")
+                self.ui.set_value("video_duration", f"Duration: {duration_str}")
+                self.ui.set_value("video_channel", f"Channel: {uploader}")
+                self.ui.set_value("video_upload_date", f"Upload Date: {upload_date}")
                 
                 # Get and set estimated file size
                 if 'formats' in result:
-                    format_choice = dpg.get_value("format_combo")
-                    size = self._get_estimated_size(result, format_choice)
-                    dpg.set_value("estimated_size", f"Estimated Size: {size}")
+                    size = await self.engine.run_blocking(self._get_estimated_size, result, format_choice,
+                                                          self.current_format_index)
+                    self.ui.set_value("estimated_size", f"Estimated Size: {size}")
                 
                 # Update format dropdown
-                dpg.configure_item("format_combo", items=formats)
-                dpg.set_value("status", "Ready to download")
+                self.ui.configure_item("format_combo", items=formats)
+                self.ui.set_value("status", "Ready to download")
             else:
-                dpg.set_value("status", "Error retrieving video information")
-                dpg.set_value("error_message", str(result))
-        threading.Thread(target=get_info_thread).start()
+                self.ui.set_value("status", "Error retrieving video information")
+                self.ui.set_value("error_message", str(result))
+        self.engine.submit(get_info_task(), group="info")
+    
+    def on_rate_limit_change(self, host, stats):
+        """Show the shared rate-limit state on the Downloader and Batch tabs (runs on worker threads)"""
+        summary = self.downloader.retry_policy.describe()
+        text = f"Rate limit: {summary}" if summary else ""
+        self.ui.set_value("rate_limit_status", text)
+        self.ui.set_value("batch_rate_limit_status", text)
+    
+    def on_format_change(self, sender, app_data):
+        """Update the estimated size when another format is chosen"""
+        if self.current_info is None or self.current_format_index is None:
+            return
+        info, format_index = self.current_info, self.current_format_index
+        
+        # Probing stream sizes can take a moment, keep it off the UI thread
+        async def estimate_task():
+            size = await self.engine.run_blocking(self._get_estimated_size, info, app_data, format_index)
+            self.ui.set_value("estimated_size", f"Estimated Size: {size}")
+        self.engine.submit(estimate_task(), group="info")
     
-    def _get_estimated_size(self, info, format_choice):
-        """Estimate download size based on selected format"""
+    def _get_estimated_size(self, info, format_choice, format_index):
+        """Estimate download size based on selected format (blocking, may probe the streams)"""
         try:
-            # Handle format selection
-            if format_choice == "audio only":
-                for fmt in info.get('formats', []):
-                    if fmt.get('acodec') != 'none' and fmt.get('vcodec') == 'none':
-                        if 'filesize' in fmt and fmt['filesize']:
-                            return self._format_size(fmt['filesize'])
-            elif format_choice in ["best", "1080p", "720p", "480p", "360p"]:
-                # For specific resolutions
-                if format_choice != "best":
-                    height = int(format_choice[:-1])
-                    # Find closest matching format
-                    for fmt in info.get('formats', []):
-                        if fmt.get('height') == height:
-                            if 'filesize' in fmt and fmt['filesize']:
-                                return self._format_size(fmt['filesize'])
-                # If specific format not found or 'best' is selected
-                if 'filesize' in info and info['filesize']:
-                    return self._format_size(info['filesize'])
-                elif 'filesize_approx' in info and info['filesize_approx']:
-                    return self._format_size(info['filesize_approx']) + " (approx)"
+            # Video and audio of a merged selection are summed
+            size, exact = format_index.estimate_size(format_choice, probe=True)
+            if size:
+                return self._format_size(size) + ("" if exact else " (approx)")
+            
+            # Fall back to yt-dlp's size for the video as a whole
+            if 'filesize' in info and info['filesize']:
+                return self._format_size(info['filesize'])
+            elif 'filesize_approx' in info and info['filesize_approx']:
+                return self._format_size(info['filesize_approx']) + " (approx)"
             # If we couldn't determine size
             return "Unknown"
         except:
@@ -554,8 +673,6 @@ class YouTubeDownloaderGUI:
             dpg.configure_item("cancel_button", enabled=True)
         
         self.is_downloading = True
-        self.last_downloaded_bytes = 0
-        self.last_time = time.time()
         
         # Check if downloading playlist
         download_playlist = False
@@ -565,60 +682,83 @@ class YouTubeDownloaderGUI:
         # Get filename template
         filename_template = self.settings.get("filename_template", "%(title)s")
         
-        # Start download in a separate thread to avoid freezing GUI
-        def download_thread():
-            dpg.set_value("status", "Starting download...")
+        # Reuse the info from "Get Info" if it was for this URL
+        info = self.current_info if url == self.current_info_url else None
+        # The interactive download gets a bigger share of the bandwidth than batch items
+        job = DownloadJob(url, self.download_path, format_choice, filename_template, self.progress_hook, info,
+                          weight=2.0, playlist=download_playlist)
+        if info is not None:
+            job.format_index = self.current_format_index
+        self.downloader.journal_job(job)
+        self.current_job = job
+        
+        title = dpg.get_value("video_title")[7:]  # Remove "Title: " prefix
+        
+        # Run the download on the job engine to avoid freezing GUI
+        async def download_task():
+            self.ui.set_value("status", "Starting download...")
             
             # Add timestamp to history before download starts
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            title = dpg.get_value("video_title")[7:]  # Remove "Title: " prefix
             history_entry = {
                 "timestamp": timestamp,
                 "title": title,
+                "video_id": (job.info or {}).get("id"),
+                "url": url,
                 "format": format_choice,
                 "status": "Downloading",
                 "filepath": self.download_path
             }
             
             # Add to history and update UI
-            self.download_history.append(history_entry)
-            self.update_history_table()
+            self.add_history_entry(history_entry)
+            self.current_history_entry = history_entry
             
-            if download_playlist:
-                success, message = self.downloader.download_playlist(url, self.download_path, format_choice, filename_template)
-            else:
-                success, message = self.downloader.download_video(url, self.download_path, format_choice, filename_template)
+            try:
+                if download_playlist:
+                    # Takes no transfer slot itself, its entries queue for them
+                    success, message = await self.engine.run_blocking(
+                        self.downloader.download_playlist, url, self.download_path, format_choice, filename_template, job=job
+                    )
+                else:
+                    success, message = await self.engine.transfer(self.downloader.download_job, job)
+            except asyncio.CancelledError:
+                # Stop the blocking transfer as well as this task
+                job.cancel()
+                raise
+            
+            # Progress still queued would overwrite the statuses below
+            self.progress_bus.discard("download")
+            
+            # The transfer slot is free again, merges finish in the post-processing stage
+            if success and job.postprocessing:
+                stats = self.downloader.postprocessing.stats()
+                self.ui.set_value("status", f"Merging video and audio... ({stats['queued']} queued)")
+                await self.engine.wait(job.postprocessing)
+                merged, merge_message = self.downloader.wait_for_postprocessing(job)
+                if not merged:
+                    success, message = False, merge_message
             
             # Update history with final status
             history_entry["status"] = "Complete" if success else "Failed"
-            self.update_history_table()
+            history_entry["video_id"] = (job.info or {}).get("id")
+            self.history_entry_changed(history_entry)
             
             # Update UI when download completes
             if success:
-                dpg.set_value("status", message)
+                self.ui.set_value("status", message)
                 self._show_notification("Download Complete", title)
             else:
-                dpg.set_value("status", "Download failed")
-                dpg.set_value("error_message", message)
+                self.ui.set_value("status", "Download failed")
+                self.ui.set_value("error_message", message)
                 self._show_notification("Download Failed", f"{title} - {message}")
             
-            dpg.set_value("progress_text", "Progress: 100%")
-            dpg.configure_item("download_button", enabled=True)
-            dpg.configure_item("cancel_button", enabled=False)
+            self.ui.set_value("progress_text", "Progress: 100%")
+            self.ui.configure_item("download_button", enabled=True)
+            self.ui.configure_item("cancel_button", enabled=False)
             self.is_downloading = False
         
-        download_thread = threading.Thread(target=download_thread)
-        download_thread.daemon = True
-        download_thread.start()
-
-        # Monitor the download thread and check for cancelation
-        def monitor_thread():
-            while download_thread.is_alive() and self.is_downloading:
-                time.sleep(0.1)
-        
-        monitor = threading.Thread(target=monitor_thread)
-        monitor.daemon = True
-        monitor.start()
+        self.engine.submit(download_task(), group="download")
     
     def _show_notification(self, title, message):
         """Show a system notification if available"""
@@ -629,7 +769,12 @@ class YouTubeDownloaderGUI:
     def on_cancel_click(self):
         """Handle cancel button click"""
         if self.is_downloading:
-            self.downloader.cancel_download()
+            if self.current_job is not None:
+                self.downloader.cancel_job(self.current_job)
+            else:
+                self.downloader.cancel_download()
+            # Also drops the download if it is still waiting for a transfer slot
+            self.engine.cancel_group("download")
             dpg.set_value("status", "Canceling download...")
             if dpg.does_item_exist("download_button"):
                 dpg.configure_item("download_button", enabled=True)
@@ -637,9 +782,9 @@ class YouTubeDownloaderGUI:
                 dpg.configure_item("cancel_button", enabled=False)
             
             # Update history with canceled status
-            if self.download_history:
-                self.download_history[-1]["status"] = "Canceled"
-                self.update_history_table()
+            if self.current_history_entry is not None and self.current_history_entry["status"] == "Downloading":
+                self.current_history_entry["status"] = "Canceled"
+                self.history_entry_changed(self.current_history_entry)
     
     def select_directory(self):
         """Open directory selection dialog"""
@@ -676,66 +821,82 @@ class YouTubeDownloaderGUI:
         dpg.set_value("default_directory", self.settings["downloads_folder"])
     
     def progress_hook(self, d):
+        """Post progress of the Downloader tab's job (runs on the download thread)"""
+        self.progress_bus.post("download", d)
+    
+    def render_progress(self, key, d):
+        """Show the latest progress event of the Downloader tab or a batch row"""
+        if key == "download":
+            self._render_download_progress(d)
+        else:
+            self._render_batch_progress(key[1], d)
+    
+    def _render_download_progress(self, d):
         """Update progress bar based on download progress"""
-        if d['status'] == 'downloading':
-            try:
-                downloaded = d.get('downloaded_bytes', 0)
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                
-                # Calculate download speed
-                current_time = time.time()
-                time_diff = current_time - self.last_time
-                
-                if time_diff >= 1:  # Update every second
-                    byte_diff = downloaded - self.last_downloaded_bytes
-                    speed = byte_diff / time_diff
-                    
-                    # Calculate ETA
-                    if speed > 0 and total > 0:
-                        remaining_bytes = total - downloaded
-                        eta_seconds = remaining_bytes / speed
-                        m, s = divmod(int(eta_seconds), 60)
-                        h, m = divmod(m, 60)
-                        if h > 0:
-                            eta = f"{h}h {m}m {s}s"
-                        elif m > 0:
-                            eta = f"{m}m {s}s"
-                        else:
-                            eta = f"{s}s"
-                        dpg.set_value("download_eta", f"ETA: {eta}")
-                    
-                    # Format speed for display
-                    if speed < 1024:
-                        speed_str = f"{speed:.1f} B/s"
-                    elif speed < 1024 * 1024:
-                        speed_str = f"{speed / 1024:.1f} KB/s"
-                    else:
-                        speed_str = f"{speed / (1024 * 1024):.1f} MB/s"
-                    
-                    dpg.set_value("download_speed", f"Speed: {speed_str}")
-                    self.last_downloaded_bytes = downloaded
-                    self.last_time = current_time
-                
-                if total > 0:
-                    progress = downloaded / total
-                    dpg.set_value("progress", progress)
-                    progress_percent = f"{progress:.1%}"
-                    dpg.set_value("progress_text", f"Progress: {progress_percent}")
-                    
-                    # Format size display (MB)
-                    downloaded_mb = downloaded / (1024 * 1024)
-                    total_mb = total / (1024 * 1024)
-                    dpg.set_value("status", f"Downloading: {progress:.1%} ({downloaded_mb:.1f}MB of {total_mb:.1f}MB)")
+        if 'playlist_count' in d:
+            self._playlist_progress(d)
+        elif d['status'] == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            
+            # yt-dlp reports a smoothed speed and the ETA that follows from it
+            speed = d.get('speed')
+            if speed:
+                if speed < 1024:
+                    speed_str = f"{speed:.1f} B/s"
+                elif speed < 1024 * 1024:
+                    speed_str = f"{speed / 1024:.1f} KB/s"
                 else:
-                    downloaded_mb = downloaded / (1024 * 1024)
-                    dpg.set_value("status", f"Downloading... ({downloaded_mb:.1f}MB)")
-                    dpg.set_value("progress_text", f"Progress: --")
-            except Exception as e:
-                print(f"Progress error: {e}")
+                    speed_str = f"{speed / (1024 * 1024):.1f} MB/s"
+                dpg.set_value("download_speed", f"Speed: {speed_str}")
+            
+            eta_seconds = d.get('eta')
+            if eta_seconds is not None:
+                m, s = divmod(int(eta_seconds), 60)
+                h, m = divmod(m, 60)
+                if h > 0:
+                    eta = f"{h}h {m}m {s}s"
+                elif m > 0:
+                    eta = f"{m}m {s}s"
+                else:
+                    eta = f"{s}s"
+                dpg.set_value("download_eta", f"ETA: {eta}")
+            
+            if total > 0:
+                progress = downloaded / total
+                dpg.set_value("progress", progress)
+                progress_percent = f"{progress:.1%}"
+                dpg.set_value("progress_text", f"Progress: {progress_percent}")
+                
+                # Format size display (MB)
+                downloaded_mb = downloaded / (1024 * 1024)
+                total_mb = total / (1024 * 1024)
+                dpg.set_value("status", f"Downloading: {progress:.1%} ({downloaded_mb:.1f}MB of {total_mb:.1f}MB)")
+            else:
+                downloaded_mb = downloaded / (1024 * 1024)
+                dpg.set_value("status", f"Downloading... ({downloaded_mb:.1f}MB)")
+                dpg.set_value("progress_text", f"Progress: --")
                 
         elif d['status'] == 'finished':
             dpg.set_value("status", "Download finished. Processing...")
 
+    def _playlist_progress(self, d):
+        """Show overall progress of a playlist whose entries download in parallel"""
+        overall = d['playlist_progress']
+        dpg.set_value("progress", overall)
+        dpg.set_value("progress_text", f"Progress: {overall:.1%}")
+        
+        # The count grows while the playlist is still being listed
+        found = f"{d['playlist_count']}" if d['playlist_enumerated'] else f"{d['playlist_count']}+"
+        status = f"Playlist: {d['playlist_completed']}/{found} entries done"
+        if d['playlist_failed']:
+            status += f", {d['playlist_failed']} failed"
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate')
+            if total:
+                status += f" - entry {d['playlist_index']}: {(d.get('downloaded_bytes') or 0) / total:.1%}"
+        dpg.set_value("status", status)
+    
     def paste_url(self):
         """Paste URL from clipboard"""
         try:
@@ -767,41 +928,33 @@ class YouTubeDownloaderGUI:
         pass
     
     def update_history_table(self):
-        """Update the download history table"""
-        # Clear existing rows
+        """Update the download history table (only the visible rows are read and redrawn)"""
         if dpg.does_item_exist("history_table"):
-            children = dpg.get_item_children("history_table")
-            if children:
-                row_ids = children[1]  # Index 1 contains row IDs
-                for row_id in row_ids:
-                    dpg.delete_item(row_id)
-            
-            # Add history entries to table
-            for idx, entry in enumerate(self.download_history):
-                with dpg.table_row(parent="history_table", tag=f"history_row_{idx}"):
-                    dpg.add_text(entry.get("timestamp", ""))
-                    dpg.add_text(entry.get("title", "")[:50])
-                    dpg.add_text(entry.get("format", ""))
-                    
-                    # Status with color
-                    status = entry.get("status", "")
-                    if status == "Complete":
-                        dpg.add_text(status, color=[50, 200, 50])
-                    elif status == "Failed":
-                        dpg.add_text(status, color=[200, 50, 50])
-                    elif status == "Canceled":
-                        dpg.add_text(status, color=[200, 200, 50])
-                    else:
-                        dpg.add_text(status)
-                    
-                    filepath = entry.get("filepath", "")
-                    dpg.add_text(os.path.basename(filepath) if filepath else "")
-                    
-                    # Open file button
-                    if status == "Complete" and filepath:
-                        dpg.add_button(label="Open", callback=lambda s, a, u=filepath: self.open_file(u), width=60)
-                    else:
-                        dpg.add_text("")
+            self.history_view.render()
+    
+    def add_history_entry(self, entry):
+        """Add a download history entry, from any thread"""
+        self.history_view.add(entry)
+        self.ui.post("history_table", self.update_history_table)
+    
+    def history_entry_changed(self, entry):
+        """Save a changed history entry and redraw it if visible, from any thread"""
+        self.history_view.update(entry)
+        self.ui.post(("history_row", entry["id"]), self.history_view.render_entry, dict(entry))
+    
+    def on_history_filter_change(self, sender=None, app_data=None):
+        """Show the history entries matching the filter controls"""
+        status = dpg.get_value("history_status_filter")
+        self.history_view.set_filters(
+            status=None if status == "All" else status,
+            period=None if dpg.get_value("history_period_filter") == "All time" else dpg.get_value("history_period_filter"),
+            search=dpg.get_value("history_search").strip(),
+        )
+    
+    def on_history_wheel(self, sender, app_data):
+        """Scroll the history window with the mouse wheel over the table"""
+        if dpg.does_item_exist("history_table") and dpg.is_item_hovered("history_table"):
+            self.history_view.scroll_by(-int(app_data) * 3)
 
     def open_file(self, filepath):
         """Open a downloaded file"""
@@ -823,7 +976,7 @@ class YouTubeDownloaderGUI:
     
     def clear_history(self):
         """Clear download history"""
-        self.download_history = []
+        self.history_view.clear()
         self.update_history_table()
     
     def delete_selected_history(self):
@@ -833,6 +986,9 @@ class YouTubeDownloaderGUI:
     
     def clear_form(self):
         """Clear the form fields"""
+        self.current_info = None
+        self.current_info_url = None
+        self.current_format_index = None
         dpg.set_value("url_input", "")
         dpg.set_value("video_title", "Title: ")
         dpg.set_value("video_duration", "Duration: ")
@@ -849,9 +1005,15 @@ class YouTubeDownloaderGUI:
         # Get values from UI
         self.settings["theme"] = "dark" if dpg.get_value("theme_setting") == "Dark" else "light"
         self.settings["filename_template"] = dpg.get_value("filename_template")
+        self.settings["bandwidth_limit"] = dpg.get_value("bandwidth_limit")
+        self.settings["bandwidth_schedule"] = dpg.get_value("bandwidth_schedule")
+        self.settings["download_archive"] = dpg.get_value("download_archive")
+        self.settings["info_gather_concurrency"] = dpg.get_value("info_gather_concurrency")
         
         # Save settings to file
         self.save_settings()
+        self.downloader.configure(self.settings)
+        self.configure_engine()
         
         # Show confirmation
         dpg.set_value("status", "Settings saved")
@@ -861,8 +1023,18 @@ class YouTubeDownloaderGUI:
         dpg.setup_dearpygui()
         dpg.show_viewport()
         dpg.set_primary_window("Primary Window", True)
-        dpg.start_dearpygui()
+        # Render frames ourselves so queued UI commands and progress run between them
+        while dpg.is_dearpygui_running():
+            self.ui.drain(self.FRAME_BUDGET)
+            self.progress_bus.pump(self.render_progress)
+            dpg.render_dearpygui_frame()
         dpg.destroy_context()
+        # Freeze the journal first, so downloads stopped by the shutdown are resumed next time
+        self.downloader.journal.close()
+        self.engine.shutdown()
+        # Write the history entries still queued
+        self.history_view.close()
+        self.history_store.close()
     
     def select_batch_directory(self):
         """Open directory selection dialog for batch downloads"""
@@ -901,18 +1073,44 @@ class YouTubeDownloaderGUI:
         """Handle batch download button click"""
         # Get URLs (one per line)
         batch_text = dpg.get_value("batch_urls")
-        urls = [url.strip() for url in batch_text.split('\n') if url.strip()]
+        # Canonical URLs, without duplicates or items that are already downloading
+        urls, collapsed = self.downloader.ingest_urls(batch_text.split('\n'))
         
         if not urls:
-            dpg.set_value("batch_status", "Please enter at least one URL")
+            if collapsed:
+                dpg.set_value("batch_status", f"All {collapsed} URL(s) are duplicates or already queued")
+            else:
+                dpg.set_value("batch_status", "Please enter at least one URL")
             return
         
         format_choice = dpg.get_value("batch_format_combo")
+        filename_template = self.settings.get("filename_template", "%(title)s")
         
+        # Each item owns its job, so callbacks and cancellation never mix
+        jobs = []
+        for url in urls:
+            job = DownloadJob(url, self.download_path, format_choice, filename_template)
+            # Journal every item up front so a crash mid-batch loses nothing
+            self.downloader.journal_job(job)
+            jobs.append(job)
+        
+        start_message = "Starting batch download..."
+        if collapsed:
+            start_message = f"Starting batch download ({collapsed} duplicate URL(s) collapsed)..."
+        self.start_batch(jobs, start_message)
+    
+    def resume_unfinished_jobs(self):
+        """Resume the downloads a crash or restart interrupted"""
+        jobs = self.downloader.resume_jobs()
+        if jobs:
+            self.start_batch(jobs, f"Resuming {len(jobs)} unfinished download(s)...")
+    
+    def start_batch(self, jobs, start_message="Starting batch download..."):
+        """Run download jobs in the batch tab"""
         # Reset batch progress
         dpg.set_value("batch_progress", 0)
         dpg.set_value("batch_error_message", "")
-        dpg.set_value("batch_overall_progress", f"Overall Progress: 0/{len(urls)}")
+        dpg.set_value("batch_overall_progress", f"Overall Progress: 0/{len(jobs)}")
         
         # Disable download button and enable cancel button
         if dpg.does_item_exist("batch_download_button"):
@@ -926,137 +1124,171 @@ class YouTubeDownloaderGUI:
         self.clear_batch_results_table()
         
         # Create initial entries in results table
-        for i, url in enumerate(urls):
+        for i, job in enumerate(jobs):
             with dpg.table_row(parent="batch_results_table", tag=f"batch_row_{i}"):
-                shortened_url = url[:50] + "..." if len(url) > 50 else url
+                shortened_url = job.url[:50] + "..." if len(job.url) > 50 else job.url
                 dpg.add_text(shortened_url, tag=f"batch_url_{i}")
                 dpg.add_text("Pending...", tag=f"batch_status_{i}")
                 dpg.add_progress_bar(default_value=0, width=-1, tag=f"batch_item_progress_{i}")
         
-        # Get filename template
-        filename_template = self.settings.get("filename_template", "%(title)s")
+        # Track jobs for cancellation
+        self.batch_jobs = jobs
         
-        # Start batch download in a separate thread
-        def batch_download_thread():
-            dpg.set_value("batch_status", "Starting batch download...")
-            total_urls = len(urls)
+        # Run the whole batch as one job on the engine
+        async def batch_download_task():
+            self.ui.set_value("batch_status", start_message)
+            total_urls = len(jobs)
             completed_count = 0
             
-            # Use ThreadPoolExecutor to parallelize downloads
-            from concurrent.futures import ThreadPoolExecutor
-            
-            # Limit concurrent downloads to 2 to avoid hitting API limits
-            with ThreadPoolExecutor(max_workers=2) as executor:
-                # Track futures for cancellation
-                self.batch_futures = []
-                
-                def download_single(idx, url):
-                    try:
+            async def download_single(idx, job):
+                nonlocal completed_count
+                url = job.url
+                format_choice = job.format_choice
+                job.progress_callback = lambda d: self.batch_item_progress_hook(d, idx)
+                success = False
+                try:
+                    # Update status
+                    self.ui.set_value(f"batch_status_{idx}", "Getting info...")
+                    
+                    # Add to history before download starts
+                    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                    history_entry = {
+                        "timestamp": timestamp,
+                        "title": url,
+                        "url": url,
+                        "format": format_choice,
+                        "status": "Downloading",
+                        "filepath": job.output_path
+                    }
+                    
+                    if job.playlist:
+                        # Interrupted playlist from the Downloader tab, finished files are skipped
+                        self.add_history_entry(history_entry)
+                        self.ui.set_value(f"batch_status_{idx}", "Downloading playlist...")
+                        success, message = await self.engine.run_blocking(
+                            self.downloader.download_playlist, url, job.output_path, format_choice,
+                            job.filename_template, job=job, priority=float('inf')
+                        )
+                        self.progress_bus.discard(("batch", idx))
+                        if success and job.postprocessing:
+                            await self.engine.wait(job.postprocessing)
+                            success, message = self.downloader.wait_for_postprocessing(job)
+                        history_entry["status"] = "Complete" if success else "Failed"
+                        self.ui.set_value(f"batch_status_{idx}", "Complete" if success else f"Failed: {message}")
+                        self.history_entry_changed(history_entry)
+                        return success
+                    
+                    # Try to get video info first (stored on the job for the download)
+                    success, info, _ = await self.engine.extract(self.downloader.get_video_info, url, job=job)
+                    
+                    if success:
+                        title = info.get('title', 'Unknown')
+                        # Update URL display with title
+                        self.ui.set_value(f"batch_url_{idx}", f"{title[:50]}...")
+                        history_entry["title"] = title
+                        history_entry["video_id"] = info.get('id')
+                        
+                        # Add to history
+                        self.add_history_entry(history_entry)
+                        
+                        # Smallest downloads get the next free transfer slot, unknown sizes go last
+                        size = await self.engine.run_blocking(self.downloader.estimate_job_size, job, True)
+                        priority = size if size else float('inf')
+                        if size:
+                            self.ui.set_value(f"batch_url_{idx}", f"{title[:50]}... ({self._format_size(size)})")
+                        
                         # Update status
-                        dpg.set_value(f"batch_status_{idx}", "Getting info...")
+                        if job.part_file and os.path.exists(job.part_file):
+                            resumed_mb = os.path.getsize(job.part_file) / (1024 * 1024)
+                            self.ui.set_value(f"batch_status_{idx}", f"Resuming from {resumed_mb:.1f} MB...")
+                        else:
+                            self.ui.set_value(f"batch_status_{idx}", "Downloading...")
                         
-                        # Add to history before download starts
-                        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                        history_entry = {
-                            "timestamp": timestamp,
-                            "title": url,
-                            "format": format_choice,
-                            "status": "Downloading",
-                            "filepath": self.download_path
-                        }
+                        # Download the video (queued until a transfer slot is free)
+                        success, message = await self.engine.transfer(self.downloader.download_job, job,
+                                                                      priority=priority)
+                        self.progress_bus.discard(("batch", idx))
+                        
+                        # Let the next item download while this one is merged
+                        if success and job.postprocessing:
+                            self.ui.set_value(f"batch_status_{idx}", "Merging...")
+                            await self.engine.wait(job.postprocessing)
+                            success, merge_message = self.downloader.wait_for_postprocessing(job)
+                            if not success:
+                                message = merge_message
+                        
+                        # Update status and history
+                        status = "Complete" if success else "Failed"
+                        self.ui.set_value(f"batch_status_{idx}", status)
+                        history_entry["status"] = status
                         
-                        # Try to get video info first
-                        success, info, _ = self.downloader.get_video_info(url)
+                        if not success:
+                            self.ui.set_value(f"batch_status_{idx}", f"Failed: {message}")
+                        self.history_entry_changed(history_entry)
                         
+                        # Show notification for completed downloads
                         if success:
-                            title = info.get('title', 'Unknown')
-                            # Update URL display with title
-                            dpg.set_value(f"batch_url_{idx}", f"{title[:50]}...")
-                            history_entry["title"] = title
-                            
-                            # Add to history
-                            self.download_history.append(history_entry)
-                            self.update_history_table()
-                            
-                            # Update status
-                            dpg.set_value(f"batch_status_{idx}", "Downloading...")
-                            
-                            # Download the video
-                            current_item_callback = lambda d: self.batch_item_progress_hook(d, idx)
-                            success, message = self.downloader.download_video_with_callback(
-                                url, self.download_path, format_choice, filename_template, current_item_callback
-                            )
-                            
-                            # Update status and history
-                            status = "Complete" if success else "Failed"
-                            dpg.set_value(f"batch_status_{idx}", status)
-                            history_entry["status"] = status
-                            
-                            if not success:
-                                dpg.set_value(f"batch_status_{idx}", f"Failed: {message}")
-                            self.update_history_table()
-                            
-                            # Show notification for completed downloads
-                            if success:
-                                self._show_notification("Download Complete", title)
-                        else:
-                            dpg.set_value(f"batch_status_{idx}", f"Failed: {info}")
-                            history_entry["status"] = "Failed"
-                            self.download_history.append(history_entry)
-                            self.update_history_table()
-                        return success
-                    except Exception as e:
-                        dpg.set_value(f"batch_status_{idx}", f"Error: {str(e)}")
-                        return False
-                
-                # Submit all download tasks
-                for i, url in enumerate(urls):
-                    if url.strip():
-                        future = executor.submit(download_single, i, url)
-                        self.batch_futures.append(future)
+                            self._show_notification("Download Complete", title)
                     else:
-                        dpg.set_value(f"batch_status_{i}", "Invalid URL")
-                        completed_count += 1
-                        dpg.set_value("batch_overall_progress", f"Overall Progress: {completed_count}/{total_urls}")
-                        dpg.set_value("batch_progress", completed_count / total_urls)
+                        self.ui.set_value(f"batch_status_{idx}", f"Failed: {info}")
+                        history_entry["status"] = "Failed"
+                        self.add_history_entry(history_entry)
+                        # Never reached download_job, which would have finished the journal entry
+                        self.downloader.fail_job(job)
+                except asyncio.CancelledError:
+                    # Stop the blocking call behind this item as well
+                    job.cancel()
+                    self.ui.set_value(f"batch_status_{idx}", "Canceled")
+                    raise
+                except Exception as e:
+                    self.ui.set_value(f"batch_status_{idx}", f"Error: {str(e)}")
+                    self.downloader.fail_job(job)
+                    success = False
                 
-                # Wait for all downloads to complete
-                for i, future in enumerate(self.batch_futures):
-                    try:
-                        success = future.result()
-                        completed_count += 1
-                        dpg.set_value("batch_overall_progress", f"Overall Progress: {completed_count}/{total_urls}")
-                        dpg.set_value("batch_progress", completed_count / total_urls)
-                    except Exception as e:
-                        print(f"Error in batch download: {e}")
-            
-            # Update UI when all downloads complete
-            self.is_downloading = False
-            dpg.configure_item("batch_download_button", enabled=True)
-            dpg.configure_item("batch_cancel_button", enabled=False)
-            dpg.set_value("batch_status", "Batch download completed")
+                completed_count += 1
+                self.ui.set_value("batch_overall_progress", f"Overall Progress: {completed_count}/{total_urls}")
+                self.ui.set_value("batch_progress", completed_count / total_urls)
+                return success
+            
+            # All items are queued at once; the engine's limits decide how many run
+            try:
+                await asyncio.gather(*(download_single(i, job) for i, job in enumerate(jobs)))
+                status = "Batch download completed"
+                stats = self.downloader.postprocessing.stats()
+                if stats['completed']:
+                    status += f" (merge wait {stats['avg_wait']:.1f}s, merge time {stats['avg_run']:.1f}s on average)"
+                self.ui.set_value("batch_status", status)
+            except asyncio.CancelledError:
+                self.ui.set_value("batch_status", "Batch download canceled")
+                raise
+            finally:
+                # Update UI when all downloads complete
+                self.is_downloading = False
+                self.ui.configure_item("batch_download_button", enabled=True)
+                self.ui.configure_item("batch_cancel_button", enabled=False)
         
-        batch_thread = threading.Thread(target=batch_download_thread)
-        batch_thread.daemon = True
-        batch_thread.start()
+        self.engine.submit(batch_download_task(), group="batch")
 
     def batch_item_progress_hook(self, d, idx):
-        """Handle progress updates for batch items"""
-        if d['status'] == 'downloading':
-            try:
-                downloaded = d.get('downloaded_bytes', 0)
-                total = d.get('total_bytes', 0) or d.get('total_bytes_estimate', 0)
-                
-                if total > 0:
-                    progress = downloaded / total
-                    dpg.set_value(f"batch_item_progress_{idx}", progress)
-                    
-                    # Don't update too frequently to avoid GUI overload
-                    if progress % 0.05 < 0.01:  # Update roughly every 5%
-                        progress_percent = f"{progress:.1%}"
-                        dpg.set_value(f"batch_status_{idx}", f"Downloading: {progress_percent}")
-            except Exception as e:
-                print(f"Batch progress error: {e}")
+        """Post progress of a batch item (runs on the download thread)"""
+        self.progress_bus.post(("batch", idx), d)
+    
+    def _render_batch_progress(self, idx, d):
+        """Show the latest progress of a batch item in its row"""
+        if 'playlist_count' in d:
+            # A resumed playlist shows its overall progress in its row
+            dpg.set_value(f"batch_item_progress_{idx}", d['playlist_progress'])
+            found = f"{d['playlist_count']}" if d['playlist_enumerated'] else f"{d['playlist_count']}+"
+            dpg.set_value(f"batch_status_{idx}", f"Playlist: {d['playlist_completed']}/{found} entries done")
+        elif d['status'] == 'downloading':
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            
+            if total > 0:
+                # Updated once per frame at most, however often yt-dlp reports
+                progress = downloaded / total
+                dpg.set_value(f"batch_item_progress_{idx}", progress)
+                dpg.set_value(f"batch_status_{idx}", f"Downloading: {progress:.1%}")
                     
         elif d['status'] == 'finished':
             dpg.set_value(f"batch_status_{idx}", "Processing...")
@@ -1064,13 +1296,10 @@ class YouTubeDownloaderGUI:
     def on_batch_cancel_click(self):
         """Handle batch cancel button click"""
         if self.is_downloading:
-            # Cancel downloads
-            self.downloader.cancel_download()
-            
-            # Cancel all pending futures if available
-            if hasattr(self, 'batch_futures'):
-                for future in self.batch_futures:
-                    future.cancel()
+            # Cancel running items and everything still queued
+            for job in self.batch_jobs:
+                self.downloader.cancel_job(job)
+            self.engine.cancel_group("batch")
             
             dpg.set_value("batch_status", "Canceling batch downloads...")
             if dpg.does_item_exist("batch_download_button"):
@@ -1079,9 +1308,9 @@ class YouTubeDownloaderGUI:
                 dpg.configure_item("batch_cancel_button", enabled=False)
             
             # Update history with canceled status
-            for entry in self.download_history:
-                if entry["status"] == "Downloading":
-                    entry["status"] = "Canceled"
+            for entry in self.history_view.live_entries():
+                entry["status"] = "Canceled"
+                self.history_view.update(entry)
             self.update_history_table()
     
     def clear_batch_results_table(self):
@@ -1140,6 +1369,12 @@ class YouTubeDownloaderGUI:
             with dpg.group(horizontal=True):
                 dpg.add_button(label="Gather Info", callback=self.on_gather_info_click, width=150, height=30, tag="gather_info_button")
                 dpg.add_button(label="Cancel", callback=self.on_cancel_info_gathering, width=150, height=30, tag="cancel_info_button", enabled=False)
+                dpg.add_spacer(width=20)
+                # Lookups run at the same time, can be changed while gathering
+                dpg.add_slider_int(label="Parallel lookups", tag="info_gather_concurrency", width=150,
+                                   min_value=1, max_value=self.engine.max_threads,
+                                   default_value=int(self.settings.get("info_gather_concurrency", 8)),
+                                   callback=self.on_info_concurrency_change)
             
             dpg.add_separator()
             
@@ -1238,7 +1473,8 @@ class YouTubeDownloaderGUI:
         """Handle gather info button click"""
         # Get URLs (one per line)
         info_text = dpg.get_value("info_urls")
-        urls = [url.strip() for url in info_text.split('\n') if url.strip()]
+        # One lookup per video, however many ways it was linked
+        urls, collapsed = dedupe_urls(info_text.split('\n'))
         
         if not urls:
             dpg.set_value("info_status", "Please enter at least one URL")
@@ -1254,6 +1490,7 @@ class YouTubeDownloaderGUI:
         create_summary_file = dpg.get_value("create_summary_file")
         content_type = dpg.get_value("info_content_type")
         urls_only = (content_type == "URLs only")
+        concurrency = dpg.get_value("info_gather_concurrency")
         
         # Reset progress
         dpg.set_value("info_progress", 0)
@@ -1267,9 +1504,12 @@ class YouTubeDownloaderGUI:
         
         self.is_gathering_info = True
         
-        # Start info gathering in a separate thread
-        def gather_info_thread():
-            dpg.set_value("info_status", "Starting to gather video information...")
+        # Gather info as a job on the engine
+        async def gather_info_task():
+            if collapsed:
+                self.ui.set_value("info_status", f"Starting to gather video information ({collapsed} duplicate URL(s) collapsed)...")
+            else:
+                self.ui.set_value("info_status", "Starting to gather video information...")
             total_urls = len(urls)
             processed_count = 0
             
@@ -1278,86 +1518,104 @@ class YouTubeDownloaderGUI:
             preview_text = ""
             file_paths = []
             
-            try:
-                # Process each URL
-                for i, url in enumerate(urls):
-                    if not self.is_gathering_info:  # Check for cancellation
-                        break
-                    
-                    dpg.set_value("info_status", f"Processing URL {i+1} of {total_urls}...")
-                    
-                    # Get video info
-                    success, info, _ = self.downloader.get_video_info(url)
+            # Lookups run concurrently; results are shown and saved in input order
+            self.gather_slots = self.engine.limiter(concurrency)
+            # Cancels the blocking lookups as well, including those waiting out a rate limit
+            gather_token = DownloadJob(None, output_folder)
+            results = [None] * total_urls
+            next_result = 0
+            
+            def add_result(url, success, info):
+                """Add one lookup result to the month categories and the preview"""
+                nonlocal preview_text
+                if success:
+                    title = info.get('title', 'Unknown')
+                    uploader = info.get('uploader', 'Unknown')
+                    upload_date = info.get('upload_date', '')
+                    duration = info.get('duration', 0)
                     
-                    if success:
-                        title = info.get('title', 'Unknown')
-                        uploader = info.get('uploader', 'Unknown')
-                        upload_date = info.get('upload_date', '')
-                        duration = info.get('duration', 0)
-                        
-                        # Format duration
-                        duration_str = "Unknown"
-                        if duration:
-                            mins, secs = divmod(int(duration), 60)
-                            hours, mins = divmod(mins, 60)
-                            if hours > 0:
-                                duration_str = f"{hours}h {mins}m {secs}s"
-                            else:
-                                duration_str = f"{mins}m {secs}s"
-                        
-                        # Get year and month from upload date
-                        if upload_date and len(upload_date) == 8:
-                            try:
-                                year = upload_date[:4]
-                                month = upload_date[4:6]
-                                day = upload_date[6:8]
-                                date_obj = datetime.strptime(upload_date, '%Y%m%d')
-                                month_name = date_obj.strftime('%B')  # Full month name
-                                month_key = f"{year}-{month} ({month_name})"
-                                
-                                # Create month category if it doesn't exist
-                                if month_key not in month_categories:
-                                    month_categories[month_key] = []
-                                
-                                # Add video info to the corresponding month
-                                video_info = {
-                                    'title': title,
-                                    'uploader': uploader,
-                                    'duration': duration_str,
-                                    'url': url,
-                                    'date': f"{year}-{month}-{day}"
-                                }
-                                month_categories[month_key].append(video_info)
-                                
-                                # Update preview
-                                preview_text += f"Added: {title} ({month_name} {year}) - {uploader}\n"
-                            except Exception as e:
-                                preview_text += f"Error processing date for {title}: {str(e)}\n"
+                    # Format duration
+                    duration_str = "Unknown"
+                    if duration:
+                        mins, secs = divmod(int(duration), 60)
+                        hours, mins = divmod(mins, 60)
+                        if hours > 0:
+                            duration_str = f"{hours}h {mins}m {secs}s"
                         else:
-                            # Add to "Unknown Date" category
-                            if "Unknown Date" not in month_categories:
-                                month_categories["Unknown Date"] = []
+                            duration_str = f"{mins}m {secs}s"
+                    
+                    # Get year and month from upload date
+                    if upload_date and len(upload_date) == 8:
+                        try:
+                            year = upload_date[:4]
+                            month = upload_date[4:6]
+                            day = upload_date[6:8]
+                            date_obj = datetime.strptime(upload_date, '%Y%m%d')
+                            month_name = date_obj.strftime('%B')  # Full month name
+                            month_key = f"{year}-{month} ({month_name})"
+                            
+                            # Create month category if it doesn't exist
+                            if month_key not in month_categories:
+                                month_categories[month_key] = []
                             
+                            # Add video info to the corresponding month
                             video_info = {
                                 'title': title,
                                 'uploader': uploader,
                                 'duration': duration_str,
                                 'url': url,
-                                'date': 'Unknown'
+                                'date': f"{year}-{month}-{day}"
                             }
-                            month_categories["Unknown Date"].append(video_info)
-                            preview_text += f"Added: {title} (Unknown Date) - {uploader}\n"
+                            month_categories[month_key].append(video_info)
+                            
+                            # Update preview
+                            preview_text += f"Added: {title} ({month_name} {year}) - {uploader}\n"
+                        except Exception as e:
+                            preview_text += f"Error processing date for {title}: {str(e)}\n"
                     else:
-                        error_message = info
-                        preview_text += f"Error processing URL {url}: {error_message}\n"
-                    
-                    # Update progress
-                    processed_count += 1
-                    dpg.set_value("info_progress", processed_count / total_urls)
-                    dpg.set_value("info_progress_text", f"Progress: {processed_count}/{total_urls}")
-                    dpg.set_value("info_results_preview", preview_text)
+                        # Add to "Unknown Date" category
+                        if "Unknown Date" not in month_categories:
+                            month_categories["Unknown Date"] = []
+                        
+                        video_info = {
+                            'title': title,
+                            'uploader': uploader,
+                            'duration': duration_str,
+                            'url': url,
+                            'date': 'Unknown'
+                        }
+                        month_categories["Unknown Date"].append(video_info)
+                        preview_text += f"Added: {title} (Unknown Date) - {uploader}\n"
+                else:
+                    error_message = info
+                    preview_text += f"Error processing URL {url}: {error_message}\n"
+            
+            async def lookup(i, url):
+                """Get one URL's info within the gatherer's parallelism"""
+                nonlocal processed_count, next_result
+                job = DownloadJob(url, output_folder, parent=gather_token)
+                success, info, _ = await self.engine.extract(self.downloader.get_video_info, url, job=job,
+                                                             slots=self.gather_slots)
+                # Keep only what the output needs, not the whole info with its formats
+                results[i] = (success, info if not success else {
+                    key: info.get(key) for key in ('title', 'uploader', 'upload_date', 'duration')
+                })
+                
+                # Add every finished result up to the first URL still being looked up
+                while next_result < total_urls and results[next_result] is not None:
+                    add_result(urls[next_result], *results[next_result])
+                    results[next_result] = True
+                    next_result += 1
                 
-                # Generate output files
+                # Update progress
+                processed_count += 1
+                self.ui.set_value("info_status", f"Looked up {processed_count} of {total_urls} URLs...")
+                self.ui.set_value("info_progress", processed_count / total_urls)
+                self.ui.set_value("info_progress_text", f"Progress: {processed_count}/{total_urls}")
+                self.ui.set_value("info_results_preview", preview_text)
+            
+            def write_info_files():
+                """Write the month files and the summary of the results gathered, returns their paths"""
                 timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
                 
                 # Sort months in descending order (newest first)
@@ -1441,35 +1699,72 @@ class YouTubeDownloaderGUI:
                                     f.write(f"URL: {video['url']}\n\n")
                                 
                                 f.write("\n")
+                return file_paths
+            
+            try:
+                # Each lookup is its own job, so Cancel stops only those not finished yet
+                lookups = [asyncio.wrap_future(self.engine.submit(lookup(i, url), group="gather_lookups"))
+                           for i, url in enumerate(urls)]
+                outcomes = await asyncio.gather(*lookups, return_exceptions=True)
+                errors = [outcome for outcome in outcomes if isinstance(outcome, Exception)]
+                if errors:
+                    raise errors[0]
+                canceled = any(future.cancelled() for future in lookups)
+                if canceled:
+                    # Stop the blocking lookups too, and keep the results that came in after a gap
+                    gather_token.cancel()
+                    for i in range(next_result, total_urls):
+                        if results[i] is not None:
+                            add_result(urls[i], *results[i])
+                
+                # Generate output files off the engine thread
+                await self.engine.run_blocking(write_info_files)
                 
                 # Show file paths in the preview
                 if file_paths:
                     files_str = "\n".join(file_paths)
                     preview_text += f"\nFiles created:\n{files_str}\n"
-                    dpg.set_value("info_results_preview", preview_text)
-                    dpg.set_value("info_status", f"Information saved to {len(file_paths)} file(s)")
+                    cache_stats = self.downloader.metadata_cache.stats()
+                    preview_text += f"Metadata cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses\n"
+                    self.ui.set_value("info_results_preview", preview_text)
+                    if canceled:
+                        self.ui.set_value("info_status", f"Info gathering canceled, {processed_count} of {total_urls} URLs saved to {len(file_paths)} file(s)")
+                    else:
+                        self.ui.set_value("info_status", f"Information saved to {len(file_paths)} file(s)")
+                elif canceled:
+                    self.ui.set_value("info_status", "Info gathering canceled")
                 else:
-                    dpg.set_value("info_status", "No valid video information was found")
+                    self.ui.set_value("info_status", "No valid video information was found")
             
+            except asyncio.CancelledError:
+                # The whole gathering was stopped, e.g. on exit
+                gather_token.cancel()
+                self.ui.set_value("info_status", "Info gathering canceled")
             except Exception as e:
-                dpg.set_value("info_error_message", f"Error gathering information: {str(e)}")
-                dpg.set_value("info_status", "Error occurred during processing")
+                gather_token.cancel()
+                self.ui.set_value("info_error_message", f"Error gathering information: {str(e)}")
+                self.ui.set_value("info_status", "Error occurred during processing")
             
             # Update UI
-            dpg.configure_item("gather_info_button", enabled=True)
-            dpg.configure_item("cancel_info_button", enabled=False)
+            self.ui.configure_item("gather_info_button", enabled=True)
+            self.ui.configure_item("cancel_info_button", enabled=False)
             self.is_gathering_info = False
+            self.gather_slots = None
         
-        info_thread = threading.Thread(target=gather_info_thread)
-        info_thread.daemon = True
-        info_thread.start()
+        self.engine.submit(gather_info_task(), group="gather")
 
+    def on_info_concurrency_change(self, sender, app_data):
+        """Change how many info lookups run at once, also for a gathering in progress (saved with Save Settings)"""
+        if self.gather_slots is not None:
+            self.engine.resize(self.gather_slots, app_data)
+    
     def on_cancel_info_gathering(self):
         """Cancel the info gathering process"""
         if self.is_gathering_info:
             self.is_gathering_info = False
-            dpg.set_value("info_status", "Canceling info gathering...")
-            dpg.configure_item("gather_info_button", enabled=True)
+            dpg.set_value("info_status", "Canceling info gathering, saving the results so far...")
+            self.engine.cancel_group("gather_lookups")
+            # The gather button comes back once the results so far are written
             dpg.configure_item("cancel_info_button", enabled=False)
             
     def clear_batch_results_table(self):
@@ -0,0 +1,209 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+DEFAULT_HISTORY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "download_history.db")
+
+# Columns of a history entry, in table order after the ID
+FIELDS = ("timestamp", "title", "video_id", "url", "format", "status", "filepath")
+
+# Period filters: name -> function giving the first timestamp included
+PERIODS = {
+    "All time": None,
+    "Today": lambda now: now.replace(hour=0, minute=0, second=0, microsecond=0),
+    "This week": lambda now: (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0),
+    "This month": lambda now: now.replace(day=1, hour=0, minute=0, second=0, microsecond=0),
+}
+
+
+class HistoryStore:
+    """Download history in SQLite, indexed for paging and filtering
+
+    Entries get their ID when added and are written by a background thread
+    in batches, one transaction per batch; later changes to an entry still
+    waiting are merged into the same write. Reads flush the queued entries
+    first and fetch only the page asked for, so the history is never loaded
+    into memory as a whole. Adding and changing entries never waits for the
+    database, only for the queue.
+    """
+
+    def __init__(self, db_path=DEFAULT_HISTORY_FILE, batch_size=200, flush_interval=0.5):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batches = 0
+        self.written = 0
+        # entry ID -> row values waiting for the writer, oldest first
+        self._pending = {}
+        self._next_id = 1
+        # _lock guards the queue, _db_lock the database; _db_lock is taken first
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._wakeup = threading.Condition(threading.Lock())
+        self._closed = False
+        self._db = None
+
+        try:
+            self._db = self._open(db_path)
+        except sqlite3.Error as e:
+            # Keep the history of this session in memory only
+            print(f"Error opening download history: {e}")
+            self._db = self._open(":memory:")
+        self._next_id = (self._db.execute("SELECT MAX(id) FROM history").fetchone()[0] or 0) + 1
+
+        self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+        self._writer.start()
+
+    def _open(self, db_path):
+        """Open the database, creating the table and its indexes"""
+        db = sqlite3.connect(db_path, check_same_thread=False)
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            "id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, title TEXT, video_id TEXT, url TEXT, "
+            "format TEXT, status TEXT NOT NULL, filepath TEXT)"
+        )
+        # Timestamps are "YYYY-MM-DD HH:MM:SS", so they sort and compare as text
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_status ON history (status, timestamp)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_video_id ON history (video_id)")
+        db.execute("CREATE INDEX IF NOT EXISTS idx_history_format ON history (format, timestamp)")
+        # Downloads still running when the app last exited never got their final status
+        db.execute("UPDATE history SET status = 'Interrupted' WHERE status = 'Downloading'")
+        db.commit()
+        return db
+
+    def add(self, entry):
+        """Queue a new entry for writing, sets and returns its ID"""
+        with self._lock:
+            entry["id"] = self._next_id
+            self._next_id += 1
+        self.update(entry)
+        return entry["id"]
+
+    def update(self, entry):
+        """Queue the current state of an added entry for writing"""
+        row = (entry["id"],) + tuple(entry.get(field) or "" for field in FIELDS)
+        with self._lock:
+            self._pending.pop(entry["id"], None)
+            self._pending[entry["id"]] = row
+            full = len(self._pending) >= self.batch_size
+        if full:
+            with self._wakeup:
+                self._wakeup.notify()
+
+    def _write_loop(self):
+        """Write queued entries every flush_interval, or as soon as a batch is full"""
+        while True:
+            with self._wakeup:
+                self._wakeup.wait(self.flush_interval)
+            self.flush()
+            if self._closed:
+                return
+
+    def flush(self):
+        """Write every queued entry in one transaction"""
+        # Holding _db_lock while taking the queue keeps writes of the same entry in order
+        with self._db_lock:
+            with self._lock:
+                if not self._pending or self._db is None:
+                    return
+                rows = list(self._pending.values())
+                self._pending.clear()
+            try:
+                with self._db:
+                    self._db.executemany(
+                        "INSERT OR REPLACE INTO history (id, " + ", ".join(FIELDS) + ") "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                    )
+                self.batches += 1
+                self.written += len(rows)
+            except sqlite3.Error as e:
+                print(f"Error writing download history: {e}")
+
+    def _where(self, status=None, period=None, search=None, now=None):
+        """Build the WHERE clause and parameters of a filter"""
+        clauses, params = [], []
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        since = PERIODS.get(period)
+        if since is not None:
+            clauses.append("timestamp >= ?")
+            params.append(since(now or datetime.now()).strftime("%Y-%m-%d %H:%M:%S"))
+        if search:
+            # Video IDs and formats match exactly (indexed), titles by substring
+            clauses.append("(video_id = ? OR format = ? OR title LIKE ? ESCAPE '\\')")
+            pattern = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.extend((search, search, f"%{pattern}%"))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def count(self, **filters):
+        """Count the entries matching a filter (status, period, search)"""
+        self.flush()
+        where, params = self._where(**filters)
+        with self._db_lock:
+            if self._db is None:
+                return 0
+            try:
+                return self._db.execute("SELECT COUNT(*) FROM history" + where, params).fetchone()[0]
+            except sqlite3.Error as e:
+                print(f"Error reading download history: {e}")
+                return 0
+
+    def page(self, offset, limit, total=None, **filters):
+        """Get entries offset to offset + limit of a filter, oldest first
+
+        With the filter's total count given, pages in the newer half are
+        read from the end, so paging costs at most half the matches.
+        """
+        self.flush()
+        where, params = self._where(**filters)
+        order = "timestamp, id"
+        # OFFSET skips rows one by one, so pages near the end are read backwards from the newest
+        if total is not None and offset > total // 2:
+            order = "timestamp DESC, id DESC"
+            limit = max(0, min(limit, total - offset))
+            offset = max(0, total - offset - limit)
+        with self._db_lock:
+            if self._db is None:
+                return []
+            try:
+                rows = self._db.execute(
+                    "SELECT id, " + ", ".join(FIELDS) + " FROM history" + where +
+                    " ORDER BY " + order + " LIMIT ? OFFSET ?", params + [limit, offset]
+                ).fetchall()
+            except sqlite3.Error as e:
+                print(f"Error reading download history: {e}")
+                return []
+        if "DESC" in order:
+            rows.reverse()
+        return [dict(zip(("id",) + FIELDS, row)) for row in rows]
+
+    def clear(self):
+        """Delete every entry, including those not written yet"""
+        with self._db_lock:
+            with self._lock:
+                self._pending.clear()
+            if self._db is not None:
+                try:
+                    with self._db:
+                        self._db.execute("DELETE FROM history")
+                except sqlite3.Error as e:
+                    print(f"Error clearing download history: {e}")
+
+    def stats(self):
+        """Get writer counters"""
+        with self._lock:
+            return {'pending': len(self._pending), 'batches': self.batches, 'written': self.written}
+
+    def close(self):
+        """Write the queued entries and close the database"""
+        self._closed = True
+        with self._wakeup:
+            self._wakeup.notify()
+        self._writer.join(timeout=5)
+        self.flush()
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -0,0 +1,195 @@
+import os
+import threading
+import dearpygui.dearpygui as dpg
+
+# Text colors of history statuses
+STATUS_COLORS = {
+    "Complete": [50, 200, 50],
+    "Failed": [200, 50, 50],
+    "Canceled": [200, 200, 50],
+    "Interrupted": [200, 200, 50],
+}
+DEFAULT_COLOR = [255, 255, 255]
+
+
+class HistoryView:
+    """Download History table that shows a window of the history store with a fixed set of row widgets
+
+    Only the entries in the window are read from the store, and scrolling
+    refills the same row widgets, so updates cost the same with 100 or 100k
+    entries. Entries are keyed by the store's stable IDs; a changed entry
+    redraws only its own row, and only when it is visible. Entries may be
+    added and changed from any thread. The store is read by a query thread,
+    which posts each window it reads to the GUI thread for drawing, so the
+    GUI never waits for the database.
+    """
+
+    def __init__(self, store, post, table, scrollbar, count_label=None, rows=20, open_callback=None):
+        self.store = store
+        # UICommandQueue.post, runs the drawing of a window read on the GUI thread
+        self.post = post
+        self.table = table
+        self.scrollbar = scrollbar
+        # Text widget showing the number of matching entries
+        self.count_label = count_label
+        self.rows = rows
+        self.open_callback = open_callback
+        # Store filter of the window (status, period, search)
+        self.filters = {}
+        # Entries matching the filter, and those shown, one per row
+        self.total = 0
+        self.window = []
+        # Entries still downloading, by ID, so their final status can be set later
+        self.live = {}
+        self._lock = threading.Lock()
+        # First entry shown, and whether the window keeps following new entries
+        self.offset = 0
+        self.follow = True
+        # Latest window asked for (offset, follow, filters, request number), read by the query thread
+        self._request = None
+        self._requests = 0
+        # Entries redrawn by render_entry -> request number at the time, so a
+        # window read before the change does not draw the old entry again
+        self._changed = {}
+        self._requested = threading.Condition()
+        self._closed = False
+        self._query_thread = threading.Thread(target=self._query_loop, name="history-query", daemon=True)
+        self._query_thread.start()
+
+    def build(self):
+        """Create the row widgets once (GUI thread, inside the table's parent)"""
+        for row in range(self.rows):
+            with dpg.table_row(parent=self.table, tag=f"history_row_{row}"):
+                for column in ("time", "title", "format", "status", "file"):
+                    dpg.add_text("", tag=f"history_{column}_{row}")
+                dpg.add_button(label="Open", tag=f"history_open_{row}", width=60, show=False,
+                               callback=lambda s, a, u: self.open_callback(u) if self.open_callback else None)
+
+    def add(self, entry):
+        """Add an entry to the store, returns its stable ID"""
+        entry_id = self.store.add(entry)
+        if entry.get("status") == "Downloading":
+            with self._lock:
+                self.live[entry_id] = entry
+        return entry_id
+
+    def update(self, entry):
+        """Save a changed entry to the store"""
+        self.store.update(entry)
+        if entry.get("status") != "Downloading":
+            with self._lock:
+                self.live.pop(entry["id"], None)
+
+    def live_entries(self):
+        """Get the entries still downloading"""
+        with self._lock:
+            return list(self.live.values())
+
+    def clear(self):
+        """Remove every entry"""
+        self.store.clear()
+        with self._lock:
+            self.live.clear()
+        self.offset = 0
+        self.follow = True
+
+    def set_filters(self, **filters):
+        """Show only the entries matching a filter, starting with the newest (GUI thread)"""
+        self.filters = {name: value for name, value in filters.items() if value}
+        self.follow = True
+        self.render()
+
+    def _render_row(self, row, entry):
+        """Show an entry (or nothing) in one row widget"""
+        if entry is None:
+            for column in ("time", "title", "format", "status", "file"):
+                dpg.set_value(f"history_{column}_{row}", "")
+            dpg.configure_item(f"history_open_{row}", show=False)
+            return
+
+        status = entry.get("status", "")
+        filepath = entry.get("filepath", "")
+        dpg.set_value(f"history_time_{row}", entry.get("timestamp", ""))
+        dpg.set_value(f"history_title_{row}", (entry.get("title") or "")[:50])
+        dpg.set_value(f"history_format_{row}", entry.get("format", ""))
+        dpg.set_value(f"history_status_{row}", status)
+        dpg.configure_item(f"history_status_{row}", color=STATUS_COLORS.get(status, DEFAULT_COLOR))
+        dpg.set_value(f"history_file_{row}", os.path.basename(filepath) if filepath else "")
+        dpg.configure_item(f"history_open_{row}", show=bool(status == "Complete" and filepath),
+                           user_data=filepath)
+
+    def render(self):
+        """Ask for the window to be read from the store and redrawn (any thread)
+
+        Requests made while a read is running are merged into the next read.
+        """
+        with self._requested:
+            self._requests += 1
+            self._request = (self.offset, self.follow, dict(self.filters), self._requests)
+            self._requested.notify()
+
+    def _query_loop(self):
+        """Read the latest requested window and post it to the GUI thread"""
+        while True:
+            with self._requested:
+                while self._request is None and not self._closed:
+                    self._requested.wait()
+                if self._closed:
+                    return
+                offset, follow, filters, number = self._request
+                self._request = None
+            total = self.store.count(**filters)
+            last_offset = max(0, total - self.rows)
+            if follow or offset > last_offset:
+                offset = last_offset
+            window = self.store.page(offset, self.rows, total=total, **filters)
+            self.post("history_window", self._show, total, offset, window, number)
+
+    def _show(self, total, offset, window, number):
+        """Refill every row with a window read by the query thread (GUI thread)"""
+        # Windows asked for after a change were read after it was saved
+        self._changed = {entry_id: (entry, changed_at) for entry_id, (entry, changed_at)
+                         in self._changed.items() if changed_at >= number}
+        window = [self._changed.get(shown["id"], (shown,))[0] for shown in window]
+        self.total = total
+        self.offset = offset
+        self.window = window
+        last_offset = max(0, total - self.rows)
+        for row in range(self.rows):
+            self._render_row(row, window[row] if row < len(window) else None)
+        dpg.configure_item(self.scrollbar, max_value=last_offset, enabled=last_offset > 0)
+        dpg.set_value(self.scrollbar, offset)
+        if self.count_label:
+            dpg.set_value(self.count_label, f"{total} entries")
+
+    def render_entry(self, entry):
+        """Redraw a changed entry if it is in the window (GUI thread)"""
+        with self._requested:
+            self._changed[entry["id"]] = (entry, self._requests)
+        if self.filters:
+            # The change may move the entry into or out of the filter
+            self.render()
+            return
+        for row, shown in enumerate(self.window):
+            if shown["id"] == entry["id"]:
+                self.window[row] = entry
+                self._render_row(row, entry)
+                return
+
+    def scroll_to(self, offset):
+        """Show the window starting at an entry; at the end the window follows new entries"""
+        last_offset = max(0, self.total - self.rows)
+        self.offset = max(0, min(int(offset), last_offset))
+        self.follow = self.offset == last_offset
+        self.render()
+
+    def scroll_by(self, rows):
+        """Move the window by a number of rows"""
+        self.scroll_to(self.offset + rows)
+
+    def close(self):
+        """Stop the query thread"""
+        with self._requested:
+            self._closed = True
+            self._requested.notify()
+        self._query_thread.join(timeout=5)
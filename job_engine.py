@@ -0,0 +1,194 @@
+import asyncio
+import functools
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Limiter:
+    """Async semaphore whose limit can be changed while jobs are waiting
+
+    Waiters get free slots lowest priority value first, in arrival order
+    among equal priorities. Only used from the engine's event loop thread.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.active = 0
+        # Heap of (priority, arrival, future)
+        self._waiters = []
+        self._arrivals = itertools.count()
+
+    @property
+    def waiting(self):
+        # Cancelled waiters stay in the heap until they are popped
+        return sum(1 for _, _, waiter in self._waiters if not waiter.done())
+
+    async def acquire(self, priority=0):
+        while self.active >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._arrivals), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if not waiter.done():
+                    # Still queued, its heap entry is skipped when popped
+                    waiter.cancel()
+                elif not waiter.cancelled():
+                    # We were woken but will not take the slot, pass it on
+                    self._wake()
+                raise
+        self.active += 1
+
+    def release(self):
+        self.active -= 1
+        self._wake()
+
+    def set_limit(self, limit):
+        self.limit = max(1, limit)
+        self._wake()
+
+    def _wake(self):
+        """Wake as many waiters as there are free slots"""
+        free = self.limit - self.active
+        while free > 0 and self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args):
+        self.release()
+
+
+class JobEngine:
+    """One asyncio event loop that owns all background jobs
+
+    Jobs are coroutines grouped by name so a whole group can be cancelled.
+    Blocking yt-dlp calls run on a fixed-size thread pool, gated by separate
+    limits for extraction and transfer, so hundreds of queued jobs cost
+    coroutines rather than threads.
+    """
+
+    def __init__(self, max_extractions=4, max_transfers=2, max_threads=16):
+        self.max_threads = max_threads
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix="job-engine")
+        self._loop = asyncio.new_event_loop()
+        self._loop.set_default_executor(self._executor)
+        self._groups = {}
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(max_extractions, max_transfers),
+                                        name="job-engine-loop", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self, max_extractions, max_transfers):
+        """Event loop thread"""
+        asyncio.set_event_loop(self._loop)
+        self.extraction_slots = Limiter(max_extractions)
+        self.transfer_slots = Limiter(max_transfers)
+        self._ready.set()
+        self._loop.run_forever()
+
+        # Let cancelled jobs unwind before the loop closes
+        pending = asyncio.all_tasks(self._loop)
+        for task in pending:
+            task.cancel()
+        if pending:
+            self._loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self._loop.close()
+
+    def submit(self, coro, group="default"):
+        """Schedule a job coroutine from any thread, returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(self._track(coro, group), self._loop)
+
+    async def _track(self, coro, group):
+        """Run a job while keeping it in its group for cancellation"""
+        task = asyncio.current_task()
+        self._groups.setdefault(group, set()).add(task)
+        try:
+            return await coro
+        finally:
+            self._groups[group].discard(task)
+
+    def cancel_group(self, group):
+        """Cancel every job in a group"""
+        def cancel():
+            for task in list(self._groups.get(group, ())):
+                task.cancel()
+        self._loop.call_soon_threadsafe(cancel)
+
+    def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking call on the engine's thread pool (awaitable)"""
+        return self._loop.run_in_executor(None, functools.partial(func, *args, **kwargs))
+
+    async def extract(self, func, *args, slots=None, **kwargs):
+        """Run a blocking extraction call within the extraction limit, or within slots if given"""
+        async with slots or self.extraction_slots:
+            return await self.run_blocking(func, *args, **kwargs)
+
+    async def transfer(self, func, *args, priority=0, **kwargs):
+        """Run a blocking download call within the transfer limit
+
+        Queued transfers start lowest priority value first, e.g. smallest
+        estimated size first.
+        """
+        await self.transfer_slots.acquire(priority)
+        try:
+            return await self.run_blocking(func, *args, **kwargs)
+        finally:
+            self.transfer_slots.release()
+
+    def submit_transfer(self, func, *args, priority=0, **kwargs):
+        """Queue a blocking download call under the transfer limit from any thread
+
+        Returns a concurrent.futures.Future, e.g. for a playlist queuing its
+        entries from the thread it runs on.
+        """
+        return self.submit(self.transfer(func, *args, priority=priority, **kwargs), group="transfer")
+
+    async def wait(self, futures):
+        """Wait for concurrent futures (e.g. merges in another process) without holding a thread"""
+        return await asyncio.gather(*(asyncio.wrap_future(future) for future in futures),
+                                    return_exceptions=True)
+
+    def set_limits(self, max_extractions=None, max_transfers=None):
+        """Change the extraction/transfer limits of running and queued jobs"""
+        def update():
+            # Keep room in the thread pool for every slot
+            if max_extractions is not None:
+                self.extraction_slots.set_limit(min(max_extractions, self.max_threads))
+            if max_transfers is not None:
+                self.transfer_slots.set_limit(min(max_transfers, self.max_threads))
+        self._loop.call_soon_threadsafe(update)
+
+    def limiter(self, limit):
+        """Create a separate limit for one kind of job, bounded by the thread pool"""
+        return Limiter(max(1, min(limit, self.max_threads)))
+
+    def resize(self, limiter, limit):
+        """Change a limiter created with limiter() from any thread, also while jobs wait on it"""
+        self._loop.call_soon_threadsafe(limiter.set_limit, min(limit, self.max_threads))
+
+    def stats(self):
+        """Get job counts"""
+        return {
+            'jobs': sum(len(tasks) for tasks in self._groups.values()),
+            'extracting': self.extraction_slots.active,
+            'extraction_queue': self.extraction_slots.waiting,
+            'transferring': self.transfer_slots.active,
+            'transfer_queue': self.transfer_slots.waiting,
+        }
+
+    def shutdown(self):
+        """Cancel all jobs and stop the event loop"""
+        if self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._executor.shutdown(wait=False)
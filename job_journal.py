@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import uuid
+import threading
+
+DEFAULT_JOURNAL_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "jobs.journal")
+
+# Phases after which a job is never resumed
+FINISHED_PHASES = ('completed', 'failed', 'canceled')
+
+
+class JobJournal:
+    """Write-ahead journal of download jobs, so a crash or restart can resume them
+
+    Every change is appended as one JSON line and synced to disk before the
+    work it describes goes ahead. Replaying the lines gives the state of each
+    unfinished job; finished jobs are dropped when the journal is compacted.
+    """
+
+    def __init__(self, journal_file=DEFAULT_JOURNAL_FILE, compact_after=1000):
+        self.journal_file = journal_file
+        # Compact once this many records were appended (or 4x the live jobs, if more)
+        self.compact_after = compact_after
+        self._lock = threading.Lock()
+        # key -> state of every unfinished job
+        self._jobs = {}
+        self._records = 0
+        self._file = None
+        self._closed = False
+        self._load()
+
+    def _load(self):
+        """Replay the journal and start a compacted one"""
+        try:
+            if os.path.exists(self.journal_file):
+                with open(self.journal_file, 'r', encoding='utf-8') as f:
+                    for line in f:
+                        try:
+                            self._apply(json.loads(line))
+                        except ValueError:
+                            # A line torn by a crash mid-write; everything before it is intact
+                            print("Skipping damaged job journal record")
+        except OSError as e:
+            print(f"Error reading job journal: {e}")
+
+        with self._lock:
+            self._compact()
+
+    def _apply(self, record):
+        """Apply one record to the job states"""
+        key = record['key']
+        if record.get('phase') in FINISHED_PHASES:
+            self._jobs.pop(key, None)
+        else:
+            self._jobs.setdefault(key, {}).update(record)
+
+    def _write(self, record):
+        """Append a record and sync it to disk (lock must be held)"""
+        if self._closed:
+            return
+        self._apply(record)
+        try:
+            self._file.write(json.dumps(record) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except (OSError, ValueError) as e:
+            print(f"Error writing job journal: {e}")
+            return
+
+        self._records += 1
+        if self._records > max(self.compact_after, 4 * len(self._jobs)):
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with one record per unfinished job (lock must be held)"""
+        if self._file:
+            self._file.close()
+            self._file = None
+        try:
+            tmp_file = self.journal_file + ".tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                for state in self._jobs.values():
+                    f.write(json.dumps(state) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_file, self.journal_file)
+        except OSError as e:
+            print(f"Error compacting job journal: {e}")
+        self._records = 0
+        self._file = open(self.journal_file, 'a', encoding='utf-8')
+
+    def add(self, job):
+        """Record a new job before it is queued, returns its journal key"""
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._write({
+                'key': key,
+                'url': job.url,
+                'output_path': job.output_path,
+                'format_choice': job.format_choice,
+                'filename_template': job.filename_template,
+                'playlist': job.playlist,
+                'phase': 'queued',
+                'created': time.time(),
+            })
+        return key
+
+    def update(self, key, **fields):
+        """Record a job's new phase and/or partial-file path"""
+        with self._lock:
+            if key in self._jobs:
+                self._write(dict(fields, key=key))
+
+    def unfinished(self):
+        """Get the state of every unfinished job, oldest first"""
+        with self._lock:
+            jobs = [dict(state) for state in self._jobs.values()]
+        return sorted(jobs, key=lambda state: state.get('created', 0))
+
+    def stats(self):
+        """Get journal counters"""
+        with self._lock:
+            return {'unfinished': len(self._jobs), 'records': self._records}
+
+    def close(self):
+        """Stop recording; jobs still running keep their last journaled phase"""
+        with self._lock:
+            self._closed = True
+            if self._file:
+                self._file.close()
+                self._file = None
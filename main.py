@@ -5,3 +5,4 @@ if __name__ == "__main__":
     downloader = YouTubeDownloader()
     app = YouTubeDownloaderGUI(downloader)
     app.run()
+    downloader.close()
@@ -0,0 +1,180 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "metadata_cache.db")
+
+
+class MetadataCache:
+    """Two-tier cache for extracted video info: in-memory LRU backed by SQLite"""
+
+    def __init__(self, db_path=DEFAULT_CACHE_FILE, memory_ttl=1800, disk_ttl=3 * 3600,
+                 max_memory_entries=256, max_disk_entries=5000):
+        # Stream URLs inside the info expire after a few hours, so keep TTLs below that
+        self.memory_ttl = memory_ttl
+        self.disk_ttl = disk_ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        # video_id -> (serialized info, time stored), most recently used last
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+
+        try:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS metadata ("
+                "video_id TEXT PRIMARY KEY, info TEXT NOT NULL, "
+                "stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_metadata_accessed ON metadata (accessed_at)")
+            self._db.commit()
+        except sqlite3.Error as e:
+            # Keep working with the memory tier only
+            print(f"Error opening metadata cache: {e}")
+            self._db = None
+
+    def configure(self, memory_ttl=None, disk_ttl=None, max_memory_entries=None, max_disk_entries=None):
+        """Update cache limits"""
+        with self._lock:
+            if memory_ttl is not None:
+                self.memory_ttl = memory_ttl
+            if disk_ttl is not None:
+                self.disk_ttl = disk_ttl
+            if max_memory_entries is not None:
+                self.max_memory_entries = max_memory_entries
+            if max_disk_entries is not None:
+                self.max_disk_entries = max_disk_entries
+            self._evict_memory()
+
+    def get(self, video_id):
+        """Get cached info for a video ID, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            # Memory tier
+            entry = self._memory.get(video_id)
+            if entry is not None:
+                data, stored_at = entry
+                if now - stored_at <= self.memory_ttl:
+                    self._memory.move_to_end(video_id)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return json.loads(data)
+                del self._memory[video_id]
+
+            # Disk tier
+            if self._db is not None:
+                try:
+                    row = self._db.execute(
+                        "SELECT info, stored_at FROM metadata WHERE video_id = ?", (video_id,)
+                    ).fetchone()
+                    if row is not None:
+                        data, stored_at = row
+                        if now - stored_at <= self.disk_ttl:
+                            self._db.execute(
+                                "UPDATE metadata SET accessed_at = ? WHERE video_id = ?", (now, video_id)
+                            )
+                            self._db.commit()
+                            # Promote to memory, keeping the original store time
+                            self._memory[video_id] = (data, stored_at)
+                            self._evict_memory()
+                            self.hits += 1
+                            self.disk_hits += 1
+                            return json.loads(data)
+                        self._db.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+                        self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Metadata cache read error: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, video_id, info):
+        """Store extracted info for a video ID"""
+        try:
+            data = json.dumps(info, default=str)
+        except (TypeError, ValueError) as e:
+            print(f"Metadata cache could not serialize info for {video_id}: {e}")
+            return
+
+        now = time.time()
+        with self._lock:
+            self._memory[video_id] = (data, now)
+            self._memory.move_to_end(video_id)
+            self._evict_memory()
+
+            if self._db is not None:
+                try:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO metadata (video_id, info, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                        (video_id, data, now, now)
+                    )
+                    self._evict_disk()
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Metadata cache write error: {e}")
+
+    def invalidate(self, video_id):
+        """Drop a video from both tiers"""
+        with self._lock:
+            self._memory.pop(video_id, None)
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM metadata WHERE video_id = ?", (video_id,))
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Metadata cache delete error: {e}")
+
+    def clear(self):
+        """Remove every cached entry"""
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM metadata")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Metadata cache clear error: {e}")
+
+    def _evict_memory(self):
+        """Drop least recently used memory entries over the size limit"""
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict_disk(self):
+        """Drop expired and least recently used disk entries over the size limit"""
+        self._db.execute("DELETE FROM metadata WHERE stored_at < ?", (time.time() - self.disk_ttl,))
+        count = self._db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0]
+        if count > self.max_disk_entries:
+            self._db.execute(
+                "DELETE FROM metadata WHERE video_id IN "
+                "(SELECT video_id FROM metadata ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_disk_entries,)
+            )
+
+    def stats(self):
+        """Get hit/miss counters"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'memory_entries': len(self._memory),
+            }
+
+    def close(self):
+        """Close the SQLite store"""
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
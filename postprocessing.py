@@ -0,0 +1,148 @@
+import os
+import time
+import shutil
+import threading
+import subprocess
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def merge_formats(ffmpeg, inputs, output):
+    """Merge downloaded video/audio parts into one file without re-encoding
+
+    Runs in a worker process. `inputs` is a list of (path, streams) where
+    streams lists the stream types ('v', 'a') taken from that part.
+    Returns the (started, finished) wall-clock times of the merge.
+    """
+    started = time.time()
+    base, ext = os.path.splitext(output)
+    temp_output = f"{base}.temp{ext}"
+
+    args = [ffmpeg, '-y', '-nostdin', '-loglevel', 'error']
+    for path, _ in inputs:
+        args += ['-i', path]
+    for index, (_, streams) in enumerate(inputs):
+        for stream in streams:
+            # Optional map, a part may turn out to lack the stream its format claimed
+            args += ['-map', f"{index}:{stream}:0?"]
+    args += ['-c', 'copy']
+    if ext.lower() in ('.mp4', '.m4a', '.mov'):
+        args += ['-movflags', '+faststart']
+    args.append(temp_output)
+
+    result = subprocess.run(args, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        if os.path.exists(temp_output):
+            os.remove(temp_output)
+        error = result.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise RuntimeError(f"ffmpeg exited with code {result.returncode}: {error[-1] if error else 'no output'}")
+
+    os.replace(temp_output, output)
+    for path, _ in inputs:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return started, time.time()
+
+
+def merge_plan(info):
+    """Get (inputs, output) for a download whose formats were left unmerged, or None"""
+    formats = info.get('requested_formats') or []
+    output = info.get('filepath')
+    if len(formats) < 2 or not output:
+        return None
+
+    inputs = []
+    for fmt in formats:
+        path = fmt.get('filepath')
+        if not path or not os.path.exists(path):
+            # Already merged by yt-dlp or never downloaded
+            return None
+        streams = [stream for stream, codec in (('v', fmt.get('vcodec')), ('a', fmt.get('acodec')))
+                   if codec != 'none']
+        inputs.append((path, streams))
+    return inputs, output
+
+
+class PostProcessingStage:
+    """Runs merges in worker processes so download workers can move on to the next URL
+
+    The pool is sized to the CPU count and started on first use. Queue depth
+    and stage timings are kept for display.
+    """
+
+    def __init__(self, max_workers=None):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.ffmpeg = shutil.which('ffmpeg')
+        self._executor = None
+        self._lock = threading.Lock()
+        self._closed = False
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        # Seconds spent waiting for a worker and merging, summed over completed tasks
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    @property
+    def available(self):
+        """Whether merges can run (ffmpeg was found)"""
+        return self.ffmpeg is not None
+
+    def _get_executor(self, replace=False):
+        """Get the process pool, starting a new one if needed"""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Post-processing stage has been shut down")
+            if self._executor is None or replace:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit_merge(self, inputs, output):
+        """Queue a merge, returns a concurrent.futures.Future"""
+        submitted = time.time()
+        try:
+            future = self._get_executor().submit(merge_formats, self.ffmpeg, inputs, output)
+        except BrokenProcessPool:
+            # A crashed worker breaks the whole pool, start a fresh one
+            future = self._get_executor(replace=True).submit(merge_formats, self.ffmpeg, inputs, output)
+
+        with self._lock:
+            self.pending += 1
+        future.add_done_callback(lambda f: self._record(f, submitted))
+        return future
+
+    def _record(self, future, submitted):
+        """Update counters and timings once a task is done"""
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+                return
+            started, finished = future.result()
+            self.completed += 1
+            self.total_wait += max(0.0, started - submitted)
+            self.total_run += finished - started
+
+    def stats(self):
+        """Get queue depth and average timings"""
+        with self._lock:
+            return {
+                'workers': self.max_workers,
+                'running': min(self.pending, self.max_workers),
+                'queued': max(0, self.pending - self.max_workers),
+                'completed': self.completed,
+                'failed': self.failed,
+                'avg_wait': self.total_wait / self.completed if self.completed else 0.0,
+                'avg_run': self.total_run / self.completed if self.completed else 0.0,
+            }
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes, by default after queued merges finish"""
+        with self._lock:
+            self._closed = True
+            executor = self._executor
+            self._executor = None
+        if executor is not None:
+            executor.shutdown(wait=wait)
@@ -0,0 +1,75 @@
+import collections
+import itertools
+import time
+
+# Progress fields the UI renders, copied out of yt-dlp's progress dicts
+EVENT_FIELDS = ('status', 'downloaded_bytes', 'total_bytes', 'total_bytes_estimate', 'speed', 'eta',
+                'playlist_index', 'playlist_count', 'playlist_enumerated', 'playlist_completed',
+                'playlist_failed', 'playlist_skipped', 'playlist_progress')
+
+
+def compact_event(d):
+    """Copy the fields the UI needs out of a progress dict, leaving info_dict and the rest behind"""
+    return {field: d[field] for field in EVENT_FIELDS if field in d}
+
+
+class ProgressBus:
+    """Carries progress events from download threads to one renderer
+
+    Hooks post a compact event and return; deque appends need no lock. The
+    render loop drains the buffer at a fixed rate, keeping only the latest
+    event per key, so the UI cost depends on that rate rather than on how
+    many jobs report and how often.
+    """
+
+    def __init__(self, fps=15):
+        self.interval = 1.0 / fps
+        self._events = collections.deque()
+        # Event sequence numbers, and per key the first number still rendered
+        self._sequence = itertools.count()
+        self._cutoffs = {}
+        self._last_render = 0.0
+        # Counted without a lock, so only approximate under contention
+        self.posted = 0
+        self.rendered = 0
+
+    def post(self, key, d):
+        """Queue a progress update for a key (e.g. a batch row), called from download threads"""
+        self._events.append((key, next(self._sequence), compact_event(d)))
+        self.posted += 1
+
+    def drain(self):
+        """Take every queued event, merged to the latest one per key (oldest key first)"""
+        latest = {}
+        events = self._events
+        while True:
+            try:
+                key, sequence, event = events.popleft()
+            except IndexError:
+                break
+            if sequence < self._cutoffs.get(key, 0):
+                continue
+            latest.pop(key, None)
+            latest[key] = event
+        self.rendered += len(latest)
+        return latest
+
+    def discard(self, key):
+        """Drop the key's events posted so far, e.g. before showing a job's final status"""
+        self._cutoffs[key] = next(self._sequence)
+
+    def pump(self, render):
+        """Call render(key, event) for the merged events if a frame is due, from the render loop"""
+        now = time.perf_counter()
+        if now - self._last_render < self.interval:
+            return
+        self._last_render = now
+        for key, event in self.drain().items():
+            try:
+                render(key, event)
+            except Exception as e:
+                print(f"Progress error: {e}")
+
+    def stats(self):
+        """Get event counters; posted / rendered is the coalescing ratio"""
+        return {'posted': self.posted, 'rendered': self.rendered, 'queued': len(self._events)}
@@ -0,0 +1,274 @@
+import time
+import random
+import logging
+import threading
+from chunk_tuner import host_key
+
+# Hosts rate limited as one, e.g. YouTube's stream servers count against youtube.com
+HOST_ALIASES = {
+    'youtu.be': 'youtube.com',
+    'googlevideo.com': 'youtube.com',
+    'ytimg.com': 'youtube.com',
+}
+
+# How a 429 shows up in yt-dlp errors and retry messages
+RATE_LIMIT_MARKERS = ("HTTP Error 429", "Too Many Requests")
+
+# Fixed delays before yt-dlp's retries of other errors, by retry kind
+RETRY_DELAYS = {
+    'http': lambda n: 10 if n > 5 else 5,
+    'fragment': lambda n: 0,
+    'extractor': lambda n: 0,
+}
+
+
+def policy_host(url):
+    """Get the host whose circuit breaker covers a URL"""
+    host = host_key(url)
+    return HOST_ALIASES.get(host, host)
+
+
+def is_rate_limited(message):
+    """Whether an error or log message reports a 429"""
+    return any(marker in str(message) for marker in RATE_LIMIT_MARKERS)
+
+
+class CircuitBreaker:
+    """Rate-limit state of one host
+
+    closed: requests go ahead. open: every request to the host waits until
+    the backoff is over. half-open: requests are let back in gradually, the
+    allowance doubling with every success until the breaker closes again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self, host):
+        self.host = host
+        self.state = self.CLOSED
+        # 429s since the breaker was last closed, sets the backoff
+        self.failures = 0
+        self.open_until = 0.0
+        # Requests allowed at the same time while half-open
+        self.allowed = 1
+        # Requests in their request phase: an extraction, or a download until its first bytes
+        self.active = 0
+        self.trips = 0
+
+
+class RetryPolicy:
+    """Shared backoff and circuit breakers for every worker
+
+    Once any worker is rate limited by a host, all requests to that host pause
+    together for an exponentially growing, jittered backoff and then resume
+    one at a time, ramping back up as they succeed.
+    """
+
+    def __init__(self, base_delay=5.0, max_delay=300.0, full_recovery=8):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        # Requests allowed at once while half-open before the breaker closes
+        self.full_recovery = full_recovery
+        self._breakers = {}
+        self._condition = threading.Condition()
+        # Called with (host, stats) whenever a breaker changes state
+        self.listeners = []
+
+    def _breaker(self, host):
+        """Get a host's breaker, creating it on first use (lock must be held)"""
+        breaker = self._breakers.get(host)
+        if breaker is None:
+            breaker = self._breakers[host] = CircuitBreaker(host)
+        return breaker
+
+    def _refresh(self, breaker, now):
+        """Move an open breaker whose backoff is over to half-open (lock must be held)"""
+        if breaker.state == CircuitBreaker.OPEN and now >= breaker.open_until:
+            breaker.state = CircuitBreaker.HALF_OPEN
+            breaker.allowed = 1
+            return True
+        return False
+
+    def backoff(self, attempt):
+        """Get the delay before retry number attempt (0-based): exponential, half of it jittered"""
+        delay = min(self.max_delay, self.base_delay * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def acquire(self, host, cancelled=None):
+        """Wait until a request to the host may go ahead, returns False if cancelled meanwhile"""
+        changed = False
+        with self._condition:
+            breaker = self._breaker(host)
+            while True:
+                now = time.time()
+                changed = self._refresh(breaker, now) or changed
+                if breaker.state == CircuitBreaker.CLOSED:
+                    break
+                if breaker.state == CircuitBreaker.HALF_OPEN and breaker.active < breaker.allowed:
+                    break
+                if cancelled is not None and cancelled():
+                    return False
+                # Wake up for cancellation checks and for the end of the backoff
+                timeout = 0.5
+                if breaker.state == CircuitBreaker.OPEN:
+                    timeout = min(timeout, max(0.01, breaker.open_until - now))
+                self._condition.wait(timeout)
+            breaker.active += 1
+        if changed:
+            self._notify(host)
+        return True
+
+    def release(self, host):
+        """Mark a request started with acquire as done, or past its request phase"""
+        with self._condition:
+            breaker = self._breaker(host)
+            breaker.active = max(0, breaker.active - 1)
+            self._condition.notify_all()
+
+    def record_success(self, host):
+        """Let more requests back in after a success while recovering"""
+        with self._condition:
+            breaker = self._breaker(host)
+            if breaker.state != CircuitBreaker.HALF_OPEN:
+                return
+            breaker.allowed *= 2
+            if breaker.allowed >= self.full_recovery:
+                breaker.state = CircuitBreaker.CLOSED
+                breaker.failures = 0
+            self._condition.notify_all()
+        self._notify(host)
+
+    def record_rate_limit(self, host, retry_after=None):
+        """Open the host's breaker after a 429"""
+        with self._condition:
+            breaker = self._breaker(host)
+            now = time.time()
+            self._refresh(breaker, now)
+            if breaker.state == CircuitBreaker.OPEN:
+                # Requests sent before the breaker opened, same throttling episode
+                return
+            delay = self.backoff(breaker.failures)
+            if retry_after:
+                delay = max(delay, retry_after)
+            breaker.failures += 1
+            breaker.trips += 1
+            breaker.state = CircuitBreaker.OPEN
+            breaker.open_until = now + delay
+            self._condition.notify_all()
+        print(f"Rate limited by {host}, pausing its requests for {delay:.0f}s")
+        self._notify(host)
+
+    def retry_delay(self, host, attempt, kind='http', rate_limited=False):
+        """Delay for yt-dlp's retry number attempt of a kind ('http', 'fragment', 'extractor')
+
+        Only rate limiting backs off: while the host's breaker is open the
+        retry waits out its backoff, and a retry after a 429 the breaker no
+        longer covers takes the exponential backoff. Other errors keep the
+        short fixed delays.
+        """
+        if host is not None:
+            with self._condition:
+                breaker = self._breaker(host)
+                self._refresh(breaker, time.time())
+                if breaker.state == CircuitBreaker.OPEN:
+                    # Spread the retries of all workers over a short window after the backoff
+                    return breaker.open_until - time.time() + random.uniform(0, self.base_delay)
+        if rate_limited:
+            return self.backoff(attempt)
+        return RETRY_DELAYS[kind](attempt)
+
+    def sleep_functions(self, host=None, logger=None):
+        """Get yt-dlp retry_sleep_functions using this policy
+
+        With the checkout's RateLimitLogger given, a retry after a 429 backs
+        off even when the breaker is no longer open.
+        """
+        def sleep_for(kind):
+            return lambda n: self.retry_delay(host, n, kind, logger is not None and logger.rate_limited)
+        return {kind: sleep_for(kind) for kind in RETRY_DELAYS}
+
+    def logger(self, host):
+        """Get a yt-dlp logger that opens the host's breaker when a retry reports a 429"""
+        return RateLimitLogger(self, host)
+
+    def _stats(self, breaker, now):
+        """Get the state of one breaker (lock must be held)"""
+        return {
+            'state': breaker.state,
+            'failures': breaker.failures,
+            'trips': breaker.trips,
+            'retry_in': max(0.0, breaker.open_until - now) if breaker.state == CircuitBreaker.OPEN else 0.0,
+            'allowed': breaker.allowed if breaker.state == CircuitBreaker.HALF_OPEN else None,
+            'active': breaker.active,
+        }
+
+    def stats(self):
+        """Get the state of every host's breaker"""
+        with self._condition:
+            now = time.time()
+            return {host: self._stats(breaker, now) for host, breaker in self._breakers.items()}
+
+    def describe(self):
+        """Get a one-line summary of throttled hosts for the status bar, empty if none"""
+        parts = []
+        now = time.time()
+        for host, stats in self.stats().items():
+            if stats['state'] == CircuitBreaker.OPEN:
+                resume = time.strftime('%H:%M:%S', time.localtime(now + stats['retry_in']))
+                parts.append(f"{host} rate limited, paused until {resume}")
+            elif stats['state'] == CircuitBreaker.HALF_OPEN:
+                parts.append(f"{host} recovering ({stats['allowed']} at a time)")
+        return "; ".join(parts)
+
+    def _notify(self, host):
+        """Tell listeners a breaker changed state"""
+        with self._condition:
+            stats = self._stats(self._breaker(host), time.time())
+        for listener in list(self.listeners):
+            try:
+                listener(host, stats)
+            except Exception as e:
+                print(f"Error in rate limit listener: {e}")
+
+
+class RateLimitLogger:
+    """yt-dlp logger that forwards to the yt_dlp logger and reports 429s to the policy
+
+    yt-dlp logs "Got error: HTTP Error 429 ... Retrying" right before it asks
+    the retry sleep function for a delay, so the breaker is already open by then.
+    """
+
+    def __init__(self, policy, host):
+        self.policy = policy
+        self.host = host
+        # Last error yt-dlp reported, also when ignoreerrors kept it from being raised
+        self.last_error = None
+        # Whether the error of the retry in progress was a 429
+        self.rate_limited = False
+        self._logger = logging.getLogger("yt_dlp")
+
+    def _check(self, message):
+        limited = is_rate_limited(message)
+        if "Retrying" in str(message):
+            self.rate_limited = limited
+        if limited:
+            self.policy.record_rate_limit(self.host)
+
+    def debug(self, message):
+        self._check(message)
+        self._logger.debug(message)
+
+    def info(self, message):
+        self._logger.info(message)
+
+    def warning(self, message):
+        self._check(message)
+        self._logger.warning(message)
+
+    def error(self, message):
+        # With ignoreerrors, a failed extraction only shows up here
+        self.last_error = message
+        self._check(message)
+        self._logger.error(message)
@@ -0,0 +1,63 @@
+import collections
+import itertools
+import threading
+import time
+import dearpygui.dearpygui as dpg
+
+
+class UICommandQueue:
+    """GUI calls posted by worker threads, run by the render loop between frames
+
+    Commands are keyed and a new command replaces the pending one with the
+    same key, so the queue holds at most one command per widget setting and
+    posting never waits for the GUI. The render loop runs commands until its
+    per-frame time budget is spent and leaves the rest for the next frame.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> (func, args, kwargs), oldest first
+        self._pending = collections.OrderedDict()
+        # Keys for commands that must each run (not coalesced)
+        self._unique = itertools.count()
+        self.executed = 0
+        self.coalesced = 0
+
+    def post(self, key, func, *args, **kwargs):
+        """Queue func(*args, **kwargs), replacing a pending command with the same key"""
+        with self._lock:
+            if self._pending.pop(key, None) is not None:
+                self.coalesced += 1
+            self._pending[key] = (func, args, kwargs)
+
+    def call(self, func, *args, **kwargs):
+        """Queue func(*args, **kwargs) to run once on the GUI thread"""
+        self.post(('call', next(self._unique)), func, *args, **kwargs)
+
+    def set_value(self, tag, value):
+        """Queue dpg.set_value"""
+        self.post(('set_value', tag), dpg.set_value, tag, value)
+
+    def configure_item(self, tag, **kwargs):
+        """Queue dpg.configure_item; only the latest call per tag and set of options runs"""
+        self.post(('configure_item', tag, tuple(sorted(kwargs))), dpg.configure_item, tag, **kwargs)
+
+    def drain(self, budget):
+        """Run queued commands on the GUI thread for up to budget seconds"""
+        deadline = time.perf_counter() + budget
+        while time.perf_counter() < deadline:
+            with self._lock:
+                if not self._pending:
+                    return
+                _, (func, args, kwargs) = self._pending.popitem(last=False)
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                # e.g. a widget deleted after the command was queued
+                print(f"UI command error: {e}")
+            self.executed += 1
+
+    def stats(self):
+        """Get queue counters"""
+        with self._lock:
+            return {'pending': len(self._pending), 'executed': self.executed, 'coalesced': self.coalesced}
@@ -0,0 +1,113 @@
+import re
+from urllib.parse import urlparse, parse_qs
+
+# YouTube video IDs are always 11 characters from this alphabet
+VIDEO_ID_RE = re.compile(r'^[0-9A-Za-z_-]{11}$')
+
+
+def extract_video_id(url):
+    """Get the YouTube video ID from a URL, or None if it is not a single video"""
+    if not url:
+        return None
+    url = url.strip()
+
+    # A bare video ID is accepted as is
+    if VIDEO_ID_RE.match(url):
+        return url
+
+    if '://' not in url:
+        url = 'https://' + url
+    parsed = urlparse(url)
+    host = (parsed.hostname or '').lower()
+    parts = [part for part in parsed.path.split('/') if part]
+
+    candidate = None
+    if host.endswith('youtu.be'):
+        candidate = parts[0] if parts else None
+    elif host.endswith('youtube.com') or host.endswith('youtube-nocookie.com'):
+        if parts and parts[0] == 'watch':
+            candidate = parse_qs(parsed.query).get('v', [None])[0]
+        elif len(parts) >= 2 and parts[0] in ['shorts', 'embed', 'live', 'v', 'e']:
+            candidate = parts[1]
+
+    if candidate and VIDEO_ID_RE.match(candidate):
+        return candidate
+    return None
+
+
+def names_playlist(url):
+    """Whether a URL carries a list= parameter, e.g. a watch URL opened from a playlist"""
+    if not url:
+        return False
+    url = url.strip()
+    parsed = urlparse(url if '://' in url else 'https://' + url)
+    return bool(parse_qs(parsed.query).get('list'))
+
+
+# Playlist IDs (PL..., UU..., OLAK5uy_..., RD...) and channel IDs (UC + 22 characters)
+PLAYLIST_ID_RE = re.compile(r'^[0-9A-Za-z_-]{10,}$')
+CHANNEL_ID_RE = re.compile(r'^UC[0-9A-Za-z_-]{22}$')
+
+# Channel tabs that list different content, so /videos and /shorts stay distinct
+CHANNEL_TABS = ['videos', 'shorts', 'streams', 'playlists', 'live', 'featured', 'releases', 'podcasts']
+
+
+def canonicalize_url(url):
+    """Get (kind, key, canonical_url) for a URL
+
+    kind is 'video', 'playlist' or 'channel'; key identifies the item, so two
+    URLs with the same (kind, key) download the same thing. A watch URL that
+    also names a playlist is taken as the video. Other URLs get kind None and
+    are keyed by the trimmed URL itself.
+    """
+    url = (url or '').strip()
+
+    video_id = extract_video_id(url)
+    if video_id:
+        return 'video', video_id, f"https://www.youtube.com/watch?v={video_id}"
+
+    parsed = urlparse(url if '://' in url else 'https://' + url)
+    host = (parsed.hostname or '').lower()
+    if host.endswith('youtube.com'):
+        parts = [part for part in parsed.path.split('/') if part]
+        list_id = parse_qs(parsed.query).get('list', [None])[0]
+        if parts and parts[0] == 'playlist' and list_id and PLAYLIST_ID_RE.match(list_id):
+            return 'playlist', list_id, f"https://www.youtube.com/playlist?list={list_id}"
+
+        channel = None
+        if len(parts) >= 2 and parts[0] == 'channel' and CHANNEL_ID_RE.match(parts[1]):
+            channel, rest = parts[1], parts[2:]
+        elif len(parts) >= 2 and parts[0] in ['c', 'user']:
+            channel, rest = f"{parts[0]}/{parts[1].lower()}", parts[2:]
+        elif parts and parts[0].startswith('@'):
+            # Handles are case-insensitive
+            channel, rest = parts[0].lower(), parts[1:]
+        if channel:
+            tab = rest[0].lower() if rest and rest[0].lower() in CHANNEL_TABS else None
+            key = f"{channel}/{tab}" if tab else channel
+            prefix = "channel/" if CHANNEL_ID_RE.match(channel) else ""
+            return 'channel', key, f"https://www.youtube.com/{prefix}{key}"
+
+    return None, url, url
+
+
+def dedupe_urls(lines, seen=None):
+    """Canonicalize URLs and drop duplicates, keeping the first occurrence
+
+    Items whose (kind, key) is in `seen` (e.g. jobs already in flight) count
+    as duplicates too. Returns (canonical_urls, collapsed_count); blank lines
+    are ignored and not counted.
+    """
+    seen = set(seen or ())
+    urls = []
+    collapsed = 0
+    for line in lines:
+        if not line.strip():
+            continue
+        kind, key, canonical_url = canonicalize_url(line)
+        if (kind, key) in seen:
+            collapsed += 1
+            continue
+        seen.add((kind, key))
+        urls.append(canonical_url)
+    return urls, collapsed
@@ -0,0 +1,179 @@
+import threading
+from contextlib import contextmanager
+import yt_dlp
+from yt_dlp.postprocessor import PostProcessor
+
+# Marker for params that did not exist before a checkout override
+_MISSING = object()
+
+
+class CheckoutDispatchPP(PostProcessor):
+    """Forwards post_process runs to the current checkout's callback"""
+
+    def __init__(self, worker):
+        super().__init__(worker.ydl)
+        self.worker = worker
+
+    def run(self, info):
+        callback = self.worker.postprocess_callback
+        if callback:
+            info = callback(info) or info
+        return [], info
+
+
+class PooledYoutubeDL:
+    """A long-lived YoutubeDL instance that is lent out to one job at a time"""
+
+    def __init__(self, profile, options):
+        self.profile = profile
+        self.progress_callback = None
+        self.postprocess_callback = None
+        self._saved_params = {}
+        # Format selector of the profile while a checkout overrides 'format'
+        self._saved_selector = _MISSING
+
+        # Register a single dispatcher so each checkout can bring its own callback
+        options = dict(options)
+        options['progress_hooks'] = [self._dispatch_progress]
+        self.ydl = yt_dlp.YoutubeDL(options)
+        self.ydl.add_post_processor(CheckoutDispatchPP(self), when='post_process')
+
+    def _dispatch_progress(self, d):
+        """Forward yt-dlp progress updates to the current job's callback"""
+        if self.progress_callback:
+            self.progress_callback(d)
+
+    def apply_overrides(self, overrides):
+        """Apply per-job params on top of the profile options"""
+        for key, value in overrides.items():
+            if key not in self._saved_params:
+                self._saved_params[key] = self.ydl.params.get(key, _MISSING)
+            if key == 'outtmpl' and not isinstance(value, dict):
+                # yt-dlp keeps outtmpl as a dict once the instance is created
+                value = {**yt_dlp.utils.DEFAULT_OUTTMPL, 'default': value}
+            self.ydl.params[key] = value
+            if key == 'format':
+                # yt-dlp builds the selector once in __init__ and never reads params['format'] again
+                if self._saved_selector is _MISSING:
+                    self._saved_selector = self.ydl.format_selector
+                self.ydl.format_selector = self._build_selector(value)
+
+    def _build_selector(self, value):
+        """Build a format selector the way YoutubeDL.__init__ does"""
+        if value in (None, '-') or callable(value):
+            return value
+        return self.ydl.build_format_selector(value)
+
+    def reset(self):
+        """Restore the profile options after a job is done with this instance"""
+        for key, value in self._saved_params.items():
+            if value is _MISSING:
+                self.ydl.params.pop(key, None)
+            else:
+                self.ydl.params[key] = value
+        self._saved_params = {}
+        if self._saved_selector is not _MISSING:
+            self.ydl.format_selector = self._saved_selector
+            self._saved_selector = _MISSING
+        self.progress_callback = None
+        self.postprocess_callback = None
+
+    def close(self):
+        """Close the underlying YoutubeDL instance (also saves its cookies)"""
+        try:
+            self.ydl.close()
+        except Exception as e:
+            print(f"Error closing YoutubeDL instance: {e}")
+
+
+class YoutubeDLPool:
+    """Pool of pre-configured YoutubeDL instances keyed by option profile"""
+
+    def __init__(self, options_factory, max_per_profile=4):
+        # options_factory(profile) returns the yt-dlp options dict for that profile
+        self.options_factory = options_factory
+        self.max_per_profile = max_per_profile
+        self._idle = {}
+        self._created = {}
+        self._condition = threading.Condition()
+        self._closed = False
+        self.created_count = 0
+        self.checkout_count = 0
+
+    def _acquire(self, profile):
+        """Take an idle instance for the profile, creating one if the profile has room"""
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("YoutubeDL pool has been closed")
+
+                idle = self._idle.setdefault(profile, [])
+                if idle:
+                    self.checkout_count += 1
+                    return idle.pop()
+
+                if self._created.get(profile, 0) < self.max_per_profile:
+                    # Reserve the slot now, build the instance outside the lock
+                    self._created[profile] = self._created.get(profile, 0) + 1
+                    self.created_count += 1
+                    self.checkout_count += 1
+                    break
+
+                # Every instance of this profile is busy, wait for one to come back
+                self._condition.wait()
+
+        try:
+            return PooledYoutubeDL(profile, self.options_factory(profile))
+        except Exception:
+            with self._condition:
+                self._created[profile] -= 1
+                self.created_count -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, worker):
+        """Return an instance to the pool"""
+        worker.reset()
+        with self._condition:
+            if self._closed:
+                worker.close()
+                return
+            self._idle.setdefault(worker.profile, []).append(worker)
+            self._condition.notify()
+
+    @contextmanager
+    def checkout(self, profile, overrides=None, progress_callback=None, postprocess_callback=None):
+        """Borrow a YoutubeDL instance for one job
+
+        postprocess_callback(info) runs after each video is downloaded, before
+        yt-dlp moves the files into place.
+        """
+        worker = self._acquire(profile)
+        try:
+            if overrides:
+                worker.apply_overrides(overrides)
+            worker.progress_callback = progress_callback
+            worker.postprocess_callback = postprocess_callback
+            yield worker.ydl
+        finally:
+            self._release(worker)
+
+    def stats(self):
+        """Get pool counters"""
+        with self._condition:
+            return {
+                'created': self.created_count,
+                'checkouts': self.checkout_count,
+                'idle': sum(len(idle) for idle in self._idle.values()),
+            }
+
+    def close(self):
+        """Close all idle instances; busy ones are closed when they are returned"""
+        with self._condition:
+            self._closed = True
+            idle = [worker for workers in self._idle.values() for worker in workers]
+            self._idle = {}
+            self._condition.notify_all()
+
+        for worker in idle:
+            worker.close()